@@ -0,0 +1,204 @@
+import numpy as np
+from sqlalchemy import select, func, and_
+from config import app, db
+from cache import LRUCache, invalidate_on_commit
+from metrics import register
+from responses import encode
+from gradebook import graded
+from models import Report_Card, Submitted_Assignment, Assignment
+
+
+SOURCES = ('report_card', 'submission')
+GROUPS = ('course', 'topic', 'teacher')
+PERCENTILES = (10, 25, 50, 75, 90)
+
+analytics_cache = LRUCache(
+    maxsize=app.config['ANALYTICS_CACHE_SIZE'],
+    ttl=app.config['ANALYTICS_CACHE_TTL'],
+)
+register('analytics_cache', analytics_cache.stats)
+
+
+def julian_day(column):
+    return func.coalesce(func.julianday(column), func.julianday('now'))
+
+
+def grade_query(source):
+    """Core select of (grade, course_id, teacher_id, topic, day) rows, with
+    missing ids as 0 and missing topics as ''."""
+    if source == 'report_card':
+        return select(
+            Report_Card.grade, func.coalesce(Report_Card.course_id, 0), func.coalesce(Report_Card.teacher_id, 0),
+            func.coalesce(Report_Card.topic, ''), julian_day(Report_Card.created_at),
+        ).where(graded(Report_Card))
+
+    # submissions only carry the assignment's name, the topic and teacher
+    # come from the assignment of that name in the same course
+    assignments = (
+        select(
+            Assignment.course_id, Assignment.assignment_name,
+            func.min(Assignment.topic).label('topic'), func.min(Assignment.teacher_id).label('teacher_id'),
+        )
+        .group_by(Assignment.course_id, Assignment.assignment_name)
+        .subquery()
+    )
+    return (
+        select(
+            Submitted_Assignment.grade, func.coalesce(Submitted_Assignment.course_id, 0),
+            func.coalesce(assignments.c.teacher_id, 0), func.coalesce(assignments.c.topic, ''),
+            julian_day(Submitted_Assignment.created_at),
+        )
+        .outerjoin(assignments, and_(
+            assignments.c.course_id == Submitted_Assignment.course_id,
+            assignments.c.assignment_name == Submitted_Assignment.assignment_name,
+        ))
+        .where(graded(Submitted_Assignment))
+    )
+
+
+def grade_columns(connection, sources=SOURCES):
+    """Every grade of `sources` as a dict of equally long arrays. Topics are
+    returned as codes into the `topics` list."""
+    chunks = {name: [] for name in ('grade', 'course', 'teacher', 'topic', 'day')}
+    topics = {}
+    for source in sources:
+        result = connection.execute(grade_query(source))
+        # plain DBAPI tuples, building a Row for each of a million grades
+        # costs more than the query itself
+        cursor = result.cursor
+        try:
+            while rows := cursor.fetchmany(app.config['ANALYTICS_FETCH_SIZE']):
+                grade, course, teacher, topic, day = zip(*rows)
+                for name in set(topic).difference(topics):
+                    topics[name] = len(topics)
+                chunks['grade'].append(np.array(grade, dtype=np.float64))
+                chunks['course'].append(np.array(course, dtype=np.int64))
+                chunks['teacher'].append(np.array(teacher, dtype=np.int64))
+                chunks['topic'].append(np.fromiter(map(topics.__getitem__, topic), dtype=np.int64, count=len(topic)))
+                chunks['day'].append(np.array(day, dtype=np.float64))
+        finally:
+            result.close()
+
+    columns = {
+        name: np.concatenate(arrays) if arrays else np.empty(0, dtype=np.float64 if name in ('grade', 'day') else np.int64)
+        for name, arrays in chunks.items()
+    }
+    columns['topics'] = list(topics)
+    return columns
+
+
+def grouped(labels):
+    """(distinct labels, dense code of every row, rows per code)."""
+    keys, codes = np.unique(labels, return_inverse=True)
+    return keys, codes, np.bincount(codes, minlength=len(keys))
+
+
+def group_means(codes, values, counts):
+    return np.bincount(codes, weights=values, minlength=len(counts)) / counts
+
+
+def zscores(codes, grades, counts):
+    """Each grade's z-score within its group, 0 where the group has no spread."""
+    mean = group_means(codes, grades, counts)
+    std = np.sqrt(np.maximum(group_means(codes, grades * grades, counts) - mean * mean, 0.0))
+    deviation = grades - mean[codes]
+    spread = std[codes]
+    return np.divide(deviation, spread, out=np.zeros_like(deviation), where=spread > 0)
+
+
+def percentiles(codes, grades, counts):
+    """PERCENTILES of every group at once, linearly interpolated like
+    np.percentile, as an array of shape (groups, len(PERCENTILES))."""
+    # grades are whole numbers, so a single sort of group * span + grade
+    # orders them by group and then grade
+    low_grade = grades.min()
+    span = int(grades.max() - low_grade) + 1
+    ordered = np.sort(codes * span + (grades - low_grade).astype(np.int64)) % span + low_grade
+    starts = np.cumsum(counts) - counts
+    position = starts[:, None] + (counts[:, None] - 1) * (np.array(PERCENTILES) / 100.0)
+    low = np.floor(position).astype(np.int64)
+    high = np.ceil(position).astype(np.int64)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def trends(codes, grades, days, counts):
+    """Least squares slope of grade against time per group, in grade points
+    per 30 days; NaN where every grade was given on the same day."""
+    centered = days - group_means(codes, days, counts)[codes]
+    spread = np.bincount(codes, weights=centered * centered, minlength=len(counts))
+    slope = np.bincount(codes, weights=centered * grades, minlength=len(counts))
+    return np.divide(slope, spread, out=np.full(len(counts), np.nan), where=spread > 1e-9) * 30
+
+
+def summarize(codes, counts, grades, days, relative):
+    """Statistics of every group as a list of dicts. `relative` holds each
+    grade's z-score against whatever the group is compared with."""
+    mean = group_means(codes, grades, counts)
+    std = np.sqrt(np.maximum(group_means(codes, grades * grades, counts) - mean * mean, 0.0))
+    zscore = group_means(codes, relative, counts)
+    struggling = np.bincount(codes, weights=relative < -2, minlength=len(counts))
+    bands = percentiles(codes, grades, counts)
+    slope = trends(codes, grades, days, counts)
+
+    return [
+        {
+            "count": int(counts[n]),
+            "mean": round(float(mean[n]), 2),
+            "stddev": round(float(std[n]), 2),
+            "percentiles": {f"p{q}": round(float(value), 2) for q, value in zip(PERCENTILES, bands[n])},
+            "zscore": round(float(zscore[n]), 3),
+            "below_2_stddev": int(struggling[n]),
+            "trend_per_30_days": None if np.isnan(slope[n]) else round(float(slope[n]), 3),
+        }
+        for n in range(len(counts))
+    ]
+
+
+def cohort_statistics(columns, groups=GROUPS):
+    grades, days = columns['grade'], columns['day']
+    if not len(grades):
+        return {"count": 0, "overall": None, **{group: [] for group in groups}}
+
+    everyone = np.zeros(len(grades), dtype=np.int64)
+    cohort_z = zscores(everyone, grades, np.array([len(grades)]))
+    # topics and teachers are compared with the rest of the same course, so
+    # one hard marking course doesn't make all of its topics look difficult
+    _, course_codes, course_counts = grouped(columns['course'])
+    course_z = zscores(course_codes, grades, course_counts)
+
+    payload = {
+        "count": int(len(grades)),
+        "overall": summarize(everyone, np.array([len(grades)]), grades, days, cohort_z)[0],
+    }
+    for group in groups:
+        keys, codes, counts = grouped(columns[group])
+        relative = cohort_z if group == 'course' else course_z
+        rows = summarize(codes, counts, grades, days, relative)
+        for key, row in zip(keys.tolist(), rows):
+            if group == 'topic':
+                row['topic'] = columns['topics'][key] or None
+            else:
+                row[f'{group}_id'] = key or None
+        rows.sort(key=lambda row: row['zscore'])
+        payload[group] = rows
+    return payload
+
+
+def grade_analytics(sources=SOURCES, groups=GROUPS):
+    """Cohort statistics over every grade of `sources`, grouped by
+    `groups`, encoded and cached until a grade or assignment is written."""
+    key = (tuple(sources), tuple(groups))
+    payload = analytics_cache.get(key)
+    if payload is None:
+        # a Connection rather than the session, whose results don't expose the cursor
+        columns = grade_columns(db.session.connection(bind_arguments={"mapper": Report_Card}), sources)
+        payload = encode({"sources": list(sources), **cohort_statistics(columns, groups)})
+        analytics_cache.set(key, payload)
+    return payload
+
+
+def affected_analytics(obj):
+    return {'grades'} if isinstance(obj, (Report_Card, Submitted_Assignment, Assignment)) else ()
+
+
+invalidate_on_commit('analytics', affected_analytics, lambda keys: analytics_cache.clear())
@@ -1,12 +1,41 @@
-import os
-from flask import request, make_response, session, send_from_directory, render_template
-from models import Teacher, Student, Parent, Course, Content, User, Report_Card, Assignment, Event, Saved_Content, Comment, Submitted_Assignment
+import io
+import threading
+import time
+import click
+from urllib.parse import urlencode
+from flask import request, make_response, session, render_template, url_for
+from models import Teacher, Student, Parent, Course, Content, User, Report_Card, Assignment, Event, Saved_Content, Comment, Submitted_Assignment, Blob, Upload, Job
 from flask_restful import Resource
 from datetime import datetime
 from config import mash, db, api, app, admin
+from pagination import paginate, parse_limit
+from loaders import eager, load_with
+from serializers import CompiledSchema, compile_schemas, check_serializers
+from responses import encode, json_response
+from links import Link, Links
+from dashboard import dashboard_cache, dashboard_key, store_dashboard
+from response_cache import cached_response
+from identity_cache import cached_get
+from principal import current_principal, remember, forget
+from metrics import snapshot
+from sessions import sweep_sessions, ensure_session_sweeper
+from passwords import PoolSaturated
+from bulk_import import ROLES, import_users, read_rows
+from storage import configure_uploads, store_upload, send_stored, send_blob, start_upload, append_upload, complete_upload
+from thumbnails import send_thumbnail
+from jobs import ensure_workers, start_workers
+from tasks import queue_upload_processing
+from query_plans import check_query_plans
+from schedule import calendar
+from conflicts import find_conflicts, schedule_index
+from gradebook import gradebook, rebuild_gradebook
+from analytics import SOURCES, GROUPS, grade_analytics
+from grading import grading_queue, is_grade, parse_grades, grade_submissions
 from flask_admin.contrib.sqla import ModelView
 from werkzeug.exceptions import NotFound, MethodNotAllowed, ServiceUnavailable, BadRequest, InternalServerError
-from werkzeug.utils import secure_filename
+
+
+configure_uploads(app)
 
 
 @app.errorhandler(NotFound)
@@ -44,42 +73,68 @@ api.add_resource(Index, '/')
 
 
 def User_details(user):
+    key = dashboard_key(user)
+    payload = dashboard_cache.get(key)
+
+    if payload is None:
+        payload, sources = build_dashboard(user)
+        payload = encode(payload)
+        store_dashboard(key, payload, sources)
+
+    return json_response(payload)
+
+
+def build_dashboard(user):
     if 'lecturer' in user.email:
-        return make_response(
-            {
-                "teacher_id": user.teacher_id,
-                "name": f'{user.teacher.firstname} {user.teacher.lastname}',
-                "email": user.email,
-                "image_url": user.teacher.image_url,
-                "expertise": user.teacher.expertise,
-                "department": user.teacher.department,
-                "docs": contents_schema.dump(user.teacher.docs),
-                "courses": courses_schema.dump(user.teacher.courses),
-            }, 200
-        )
+        teacher = Teacher.query.options(
+            load_with(Teacher.docs, contents_schema),
+            load_with(Teacher.courses, courses_schema),
+        ).filter_by(id=user.teacher_id).first()
+
+        return {
+            "teacher_id": user.teacher_id,
+            "name": f'{teacher.firstname} {teacher.lastname}',
+            "email": user.email,
+            "image_url": teacher.image_url,
+            "expertise": teacher.expertise,
+            "department": teacher.department,
+            "docs": contents_schema.dump(teacher.docs),
+            "courses": courses_schema.dump(teacher.courses),
+        }, [teacher, *teacher.courses, *(t for c in teacher.courses for t in c.teachers)]
+
     elif 'student' in user.email:
-        return make_response(
-            {
-                "student_id": user.student_id,
-                "name": f'{user.student.firstname} {user.student.lastname}',
-                "email": user.email,
-                "image_url": user.student.image_url,
-                "report_card": report_cards_schema.dump(user.student.report_card),
-                "assignments": submitted_assignments_schema.dump(user.student.assignments),
-                "docs": contents_schema.dump(user.student.docs),
-                "courses": courses_schema.dump(user.student.courses),
-                "event": events_schema.dump(user.student.event)
-            }, 200
-        )
-    return make_response(
-        {
-            "parent_id": user.parent_id,
-            "name": f'{user.parent.firstname} {user.parent.lastname}',
+        student = Student.query.options(
+            load_with(Student.report_card, report_cards_schema),
+            load_with(Student.assignments, submitted_assignments_schema),
+            load_with(Student.docs, contents_schema),
+            load_with(Student.courses, courses_schema),
+            load_with(Student.event, events_schema),
+        ).filter_by(id=user.student_id).first()
+
+        return {
+            "student_id": user.student_id,
+            "name": f'{student.firstname} {student.lastname}',
             "email": user.email,
-            "child": students_schema.dump(user.parent.child),
-            "image_url": user.parent.image_url,
-        }, 200
-    )
+            "image_url": student.image_url,
+            "report_card": report_cards_schema.dump(student.report_card),
+            "assignments": submitted_assignments_schema.dump(student.assignments),
+            "docs": contents_schema.dump(student.docs),
+            "courses": courses_schema.dump(student.courses),
+            "event": events_schema.dump(student.event)
+        }, [student, *student.courses, *(t for c in student.courses for t in c.teachers)]
+
+    parent = Parent.query.options(
+        load_with(Parent.child, students_schema),
+    ).filter_by(id=user.parent_id).first()
+    courses = [c for child in parent.child for c in child.courses]
+
+    return {
+        "parent_id": user.parent_id,
+        "name": f'{parent.firstname} {parent.lastname}',
+        "email": user.email,
+        "child": students_schema.dump(parent.child),
+        "image_url": parent.image_url,
+    }, [parent, *parent.child, *courses, *(t for c in courses for t in c.teachers)]
 
 
 class Login(Resource):
@@ -89,8 +144,18 @@ class Login(Resource):
         user = User.query.filter_by(email=user_logins['email']).first()
 
         if user:
-            if user.authenticate(password):
+            try:
+                authenticated = user.authenticate(password)
+            except PoolSaturated:
+                return make_response(
+                    "Too many people are logging in right now, please try again shortly.", 503,
+                    {'Retry-After': str(app.config['PASSWORD_POOL_RETRY_AFTER'])}
+                )
+
+            if authenticated:
+                user.rehash(password)
                 session['user'] = user.email
+                remember(session.sid, user)
                 return User_details(user)
 
             return "Invalid email or password", 400
@@ -102,11 +167,10 @@ api.add_resource(Login, '/login')
 
 class CheckSession(Resource):
     def get(self):
-        user = session.get('user')
-        user_data = User.query.filter_by(email=user).first()
+        principal = current_principal()
 
-        if user:
-            return User_details(user_data)
+        if principal:
+            return User_details(principal)
 
         return "Please login to continue", 401
 
@@ -119,6 +183,7 @@ class Logout(Resource):
         user = session.get('user')
 
         if user:
+            forget(session.sid)
             session['user'] = None
 
             return "You have been logged out successfully", 200
@@ -127,11 +192,20 @@ class Logout(Resource):
 
 api.add_resource(Logout, '/logout')
 
+
+class Metrics(Resource):
+    def get(self):
+        return make_response(snapshot(), 200)
+
+
+api.add_resource(Metrics, '/metrics')
+
+
 class FetchFile(Resource):
     def get(self,id):
-        assignment = Assignment.query.filter_by(id=id).first()
+        assignment = cached_get(Assignment, id)
 
-        assignment_file = send_from_directory(app.config['FILE_UPLOAD_PATH'] , assignment.assignment_file , as_attachment=True)
+        assignment_file = send_stored(assignment.assignment_file, app.config['FILE_UPLOAD_PATH'], as_attachment=True)
         return assignment_file
 
 api.add_resource(FetchFile, '/assignment-file/<int:id>')
@@ -140,22 +214,32 @@ class FetchImage(Resource):
     def get(self):
         session_details = session.get('user')
 
-        user = User.query.filter_by(email=session_details).first()
+        user = cached_get(User, session_details)
 
         if 'lecturer' in user.email:
-            photo = send_from_directory(app.config['IMAGE_UPLOAD_PATH'] , user.teacher.image_url)
-            return photo
+            image_url = cached_get(Teacher, user.teacher_id).image_url
         elif 'student' in user.email:
-            photo = send_from_directory(app.config['IMAGE_UPLOAD_PATH'] , user.student.image_url)
-            return photo
-        return send_from_directory(app.config['IMAGE_UPLOAD_PATH'] , user.parent.image_url)
+            image_url = db.session.get(Student, user.student_id).image_url
+        else:
+            image_url = db.session.get(Parent, user.parent_id).image_url
+
+        size = request.args.get('size', type=int)
+        if size:
+            return send_thumbnail(image_url, app.config['IMAGE_UPLOAD_PATH'], size, request.accept_mimetypes)
+        return send_stored(image_url, app.config['IMAGE_UPLOAD_PATH'])
 
 api.add_resource(FetchImage, '/profile_image')
 
+class FetchBlob(Resource):
+    def get(self, sha256):
+        return send_blob(sha256, immutable=True)
+
+api.add_resource(FetchBlob, '/blobs/<string:sha256>')
+
 
 #Marshmallow API Endpoints
 
-class UserSchema(mash.SQLAlchemySchema):
+class UserSchema(CompiledSchema):
 
     class Meta:
         model = User
@@ -165,35 +249,29 @@ class UserSchema(mash.SQLAlchemySchema):
     teacher_id = mash.auto_field()
     parent_id = mash.auto_field()
 
-    student_url = mash.Hyperlinks(
+    student_url = Links(
         {
-            "student": mash.URLFor(
-                "studentbyid",
-                values=dict(id="<student_id>")),
-            "students_list": mash.URLFor("students")
-
-        }
+            "student": Link("studentbyid", id="<student_id>"),
+            "students_list": Link("students"),
+        },
+        requires="student_id",
     )
-    parent_url = mash.Hyperlinks(
+    parent_url = Links(
         {
-            "parent": mash.URLFor(
-                "parentbyid",
-                values=dict(id="<parent_id>")),
-            "parents_list": mash.URLFor("parents")
-
-        }
+            "parent": Link("parentbyid", id="<parent_id>"),
+            "parents_list": Link("parents"),
+        },
+        requires="parent_id",
     )
-    teacher_url = mash.Hyperlinks(
+    teacher_url = Links(
         {
-            "teacher": mash.URLFor(
-                "teacherbyid",
-                values=dict(id="<teacher_id>")),
-            "teachers_list": mash.URLFor("teachers")
-
-        }
+            "teacher": Link("teacherbyid", id="<teacher_id>"),
+            "teachers_list": Link("teachers"),
+        },
+        requires="teacher_id",
     )
 
-class ContentSchema(mash.SQLAlchemySchema):
+class ContentSchema(CompiledSchema):
 
     class Meta:
         model = Content
@@ -203,7 +281,7 @@ class ContentSchema(mash.SQLAlchemySchema):
     content_type = mash.auto_field()
     description = mash.auto_field()
 
-class CourseSchema(mash.SQLAlchemySchema):
+class CourseSchema(CompiledSchema):
 
     class Meta:
         model = Course
@@ -215,7 +293,7 @@ class CourseSchema(mash.SQLAlchemySchema):
     content = mash.List(mash.Nested(ContentSchema))
 
 
-class TeacherSchema(mash.SQLAlchemySchema):
+class TeacherSchema(CompiledSchema):
 
     class Meta:
         model = Teacher
@@ -230,7 +308,7 @@ class TeacherSchema(mash.SQLAlchemySchema):
     docs = mash.List(mash.Nested(ContentSchema))
 
 
-class ParentSchema(mash.SQLAlchemySchema):
+class ParentSchema(CompiledSchema):
 
     class Meta:
         model = Parent
@@ -245,7 +323,7 @@ class ParentSchema(mash.SQLAlchemySchema):
 
 
 
-class StudentSchema(mash.SQLAlchemySchema):
+class StudentSchema(CompiledSchema):
 
     class Meta:
         model = Student
@@ -263,18 +341,15 @@ class StudentSchema(mash.SQLAlchemySchema):
     assignments = mash.List(mash.Nested(lambda: Submitted_AssignmentSchema(only=('id','assignment_name','content', 'remarks', 'grade', 'course_id'))))
 
 
-    url = mash.Hyperlinks(
+    url = Links(
         {
-            "self": mash.URLFor(
-                "studentbyid",
-                values=dict(id="<id>")),
-            "collection": mash.URLFor("students")
-
+            "self": Link("studentbyid", id="<id>"),
+            "collection": Link("students"),
         }
     )
 
 
-class ReportCardSchema(mash.SQLAlchemySchema):
+class ReportCardSchema(CompiledSchema):
 
     class Meta:
         model = Report_Card
@@ -286,7 +361,7 @@ class ReportCardSchema(mash.SQLAlchemySchema):
     
     course_id = mash.auto_field()
 
-class AssignmentSchema(mash.SQLAlchemySchema):
+class AssignmentSchema(CompiledSchema):
 
     class Meta:
         model = Assignment
@@ -300,17 +375,14 @@ class AssignmentSchema(mash.SQLAlchemySchema):
     course_id = mash.auto_field()
 
 
-    url = mash.Hyperlinks(
+    url = Links(
         {
-            "self":mash.URLFor(
-                "assignmentbyid",
-                values=dict(id="<id>")),
-            "collection":mash.URLFor("assignments")
-
+            "self": Link("assignmentbyid", id="<id>"),
+            "collection": Link("assignments"),
         }
     )
 
-class Submitted_AssignmentSchema(mash.SQLAlchemySchema):
+class Submitted_AssignmentSchema(CompiledSchema):
 
     class Meta:
         model = Submitted_Assignment
@@ -325,7 +397,7 @@ class Submitted_AssignmentSchema(mash.SQLAlchemySchema):
     student_id = mash.auto_field()
     is_graded = mash.auto_field()
 
-class EventSchema(mash.SQLAlchemySchema):
+class EventSchema(CompiledSchema):
 
     class Meta:
         model = Event
@@ -345,7 +417,7 @@ class EventSchema(mash.SQLAlchemySchema):
     course_id = mash.auto_field()
     teacher_id = mash.auto_field()
 
-class SavedContentSchema(mash.SQLAlchemySchema):
+class SavedContentSchema(CompiledSchema):
 
     class Meta:
         model = Saved_Content
@@ -354,7 +426,7 @@ class SavedContentSchema(mash.SQLAlchemySchema):
     content_name = mash.auto_field()
     content_type = mash.auto_field()
 
-class CommentsSchema(mash.SQLAlchemySchema):
+class CommentsSchema(CompiledSchema):
     class Meta:
         model = Comment
 
@@ -366,6 +438,42 @@ class CommentsSchema(mash.SQLAlchemySchema):
     student_id = mash.auto_field()
     teacher_id = mash.auto_field()
 
+class BlobSchema(CompiledSchema):
+    class Meta:
+        model = Blob
+
+    sha256 = mash.auto_field()
+    size = mash.auto_field()
+    mime_type = mash.auto_field()
+    filename = mash.auto_field()
+    page_count = mash.auto_field()
+    scan_status = mash.auto_field()
+
+class UploadSchema(CompiledSchema):
+    class Meta:
+        model = Upload
+
+    id = mash.auto_field()
+    filename = mash.auto_field()
+    mime_type = mash.auto_field()
+    size = mash.auto_field()
+    received = mash.auto_field()
+
+class JobSchema(CompiledSchema):
+    class Meta:
+        model = Job
+
+    id = mash.auto_field()
+    kind = mash.auto_field()
+    status = mash.auto_field()
+    attempts = mash.auto_field()
+    result = mash.auto_field()
+    last_error = mash.auto_field()
+    run_at = mash.auto_field()
+
+job_schema = JobSchema()
+blob_schema = BlobSchema()
+upload_schema = UploadSchema()
 comment_schema = CommentsSchema()
 comments_schema = CommentsSchema(many=True)
 saved_content_schema = SavedContentSchema()
@@ -391,6 +499,9 @@ users_schema = UserSchema(many=True)
 student_schema = StudentSchema()
 students_schema = StudentSchema(many=True)
 
+SCHEMAS = [value for value in list(globals().values()) if isinstance(value, CompiledSchema)]
+compile_schemas(SCHEMAS)
+
 #Flask-Admin Views
 
 class UserView(ModelView):
@@ -418,25 +529,22 @@ admin.add_views(ModelView(Event, db.session))
 
 class Users(Resource):
     def get(self):
-        users = User.query.all()
-        
-        return make_response(
-            users_schema.dump(users), 200
-        )
+        return paginate(User.query, users_schema)
+
+
+def job_headers(job):
+    """Where the client can follow the processing of what it uploaded."""
+    if job is None:
+        return {}
+    return {'X-Job-Id': str(job.id), 'Link': f'<{url_for("jobbyid", id=job.id)}>; rel="monitor"'}
+
 
 class Students(Resource):
     def get(self):
-        students = Student.query.all()
-
-        return make_response(
-            students_schema.dump(students), 200
-        )
+        return paginate(Student.query, students_schema)
 
     def post(self):
-        student_image = request.files['image_url']
-        student_img = secure_filename(student_image.filename)
-        student_image.save(os.path.join(
-            app.config["IMAGE_UPLOAD_PATH"], student_img))
+        student_img = store_upload(request.files['image_url'])
 
         # print(type(student_img))
         new_student = Student(
@@ -449,17 +557,19 @@ class Students(Resource):
             parent_id=request.form.get('parent_id')
         )
         db.session.add(new_student)
-        db.session.commit()
+        db.session.flush()
 
         new_student.add_user()
+        processing = queue_upload_processing(student_img)
+        db.session.commit()
 
         return make_response(
-            student_schema.dump(new_student), 201
+            student_schema.dump(new_student), 201, job_headers(processing)
         )
     
 class StudentbyId(Resource):
     def get(self, id):
-        student = Student.query.filter_by(id=id).first()
+        student = eager(Student.query, student_schema).filter_by(id=id).first()
 
         return make_response(
             student_schema.dump(student), 200
@@ -490,24 +600,26 @@ class StudentbyId(Resource):
 
 class Assignments(Resource):
     def get(self):
-        assignments = Assignment.query.all()
-
-        return make_response(
-            assignments_schema.dump(assignments), 200
-        )
+        return paginate(Assignment.query, assignments_schema)
     
     def post(self):
-        assignment_file = request.files['assignment_file']
-        assignment = secure_filename(assignment_file.filename)
-        assignment_file.save(os.path.join(app.config["FILE_UPLOAD_PATH"],assignment))
-    
         assignment_data = request.form
-        # print(assignment_data['assignment_file'])
+
+        # large files can be sent ahead through /uploads and referenced by hash
+        processing = None
+        if 'assignment_file' in request.files:
+            assignment = store_upload(request.files['assignment_file'])
+            processing = queue_upload_processing(assignment)
+        else:
+            assignment = assignment_data.get('assignment_file')
+            if assignment and db.session.get(Blob, assignment) is None:
+                return make_response({"message": "assignment_file must be the hash of a completed upload"}, 400)
+
         new_assignment = Assignment(
             assignment_name = assignment_data.get('assignment_name'),
             topic = assignment_data.get('topic'),
             content = assignment_data.get('content'),
-            assignment_file = assignment_data.get('assignment_file'),
+            assignment_file = assignment,
             due_date = datetime.strptime(assignment_data.get('due_date'), "%Y-%m-%d").date(),
             course_id = assignment_data.get('course_id'),
             teacher_id = assignment_data.get('teacher_id'),
@@ -516,7 +628,7 @@ class Assignments(Resource):
         db.session.commit()
 
         return make_response(
-            assignment_schema.dump(new_assignment), 201
+            assignment_schema.dump(new_assignment), 201, job_headers(processing)
         )
     
 class AssignmentbyId(Resource):
@@ -554,12 +666,9 @@ class Teachers(Resource):
 
     column_searchable_list = ('firstname', 'lastname', 'email')
 
+    @cached_response('teachers', 'course_teacher', 'courses', 'contents')
     def get(self):
-        teachers = Teacher.query.all()
-
-        return make_response(
-            teachers_schema.dump(teachers), 200
-        )
+        return paginate(Teacher.query, teachers_schema)
 
     def post(self):
         teacher_data = request.get_json()
@@ -574,9 +683,10 @@ class Teachers(Resource):
             department=teacher_data['department']
         )
         db.session.add(new_teacher)
-        db.session.commit()
+        db.session.flush()
 
         new_teacher.add_user()
+        db.session.commit()
 
         return make_response(
             teacher_schema.dump(new_teacher), 201
@@ -584,7 +694,7 @@ class Teachers(Resource):
    
 class TeacherbyId(Resource):
     def get(self, id):
-        teacher = Teacher.query.filter_by(id=id).first()
+        teacher = eager(Teacher.query, teacher_schema).filter_by(id=id).first()
 
         return make_response(
             teacher_schema.dump(teacher), 200
@@ -615,11 +725,7 @@ class TeacherbyId(Resource):
 
 class Parents(Resource):
     def get(self):
-        parents = Parent.query.all()
-
-        return make_response(
-            parents_schema.dump(parents), 200
-        )
+        return paginate(Parent.query, parents_schema)
 
     def post(self):
         parent_data = request.get_json()
@@ -631,9 +737,10 @@ class Parents(Resource):
             # image_url = parent_data['Image_url']
         )
         db.session.add(new_parent)
-        db.session.commit()
+        db.session.flush()
 
         new_parent.add_user()
+        db.session.commit()
 
         return make_response(
             parent_schema.dump(new_parent), 201
@@ -641,7 +748,7 @@ class Parents(Resource):
     
 class ParentbyId(Resource):
     def get(self, id):
-        parent = Parent.query.filter_by(id=id).first()
+        parent = eager(Parent.query, parent_schema).filter_by(id=id).first()
 
         return make_response(
             parent_schema.dump(parent), 200
@@ -671,12 +778,9 @@ class ParentbyId(Resource):
 
 
 class Contents(Resource):
+    @cached_response('contents')
     def get(self):
-        contents = Content.query.all()
-
-        return make_response(
-            contents_schema.dump(contents), 200
-        )
+        return paginate(Content.query, contents_schema)
 
     def post(self):
         content_data = request.get_json()
@@ -724,13 +828,14 @@ class ContentbyId(Resource):
         return "record successfully deleted", 202
 
 
+# patching any of these moves something on a timetable
+SCHEDULE_FIELDS = {'daysOfWeek', 'startTime', 'endTime', 'startRecur', 'endRecur', 'start', 'end', 'allDay', 'student_id', 'teacher_id', 'course_id'}
+
+
 class Courses(Resource):
+    @cached_response('courses', 'course_teacher', 'teachers', 'contents')
     def get(self):
-        course = Course.query.all()
-
-        return make_response(
-            courses_schema.dump(course), 200
-        )
+        return paginate(Course.query, courses_schema)
 
     def post(self):
         course_data = request.get_json()
@@ -756,8 +861,9 @@ class Courses(Resource):
         )
 
 class CoursebyId(Resource):
+    @cached_response('courses', 'course_teacher', 'teachers', 'contents')
     def get(self, id):
-        course = Course.query.filter_by(id=id).first()
+        course = eager(Course.query, course_schema).filter_by(id=id).first()
 
         return make_response(
             course_schema.dump(course), 200
@@ -780,6 +886,12 @@ class CoursebyId(Resource):
             else:
                 setattr(course, attr, course_data[attr])
 
+        if SCHEDULE_FIELDS.intersection(course_data):
+            conflicts = find_conflicts(course)
+            if conflicts:
+                db.session.rollback()
+                return make_response({"message": "Schedule conflict", "conflicts": conflicts}, 409)
+
         db.session.add(course)
         db.session.commit()
 
@@ -799,14 +911,12 @@ class CoursebyId(Resource):
 
 class Report_Cards(Resource):
     def get(self):
-        report_card = Report_Card.query.all()
-
-        return make_response(
-            report_cards_schema.dump(report_card), 200
-        )
+        return paginate(Report_Card.query, report_cards_schema)
 
     def post(self):
         reportcard_data = request.get_json()
+        if not is_grade(reportcard_data.get('grade')):
+            return make_response({"message": "grade must be an integer"}, 400)
         new_report = Report_Card(
             topic=reportcard_data['topic'],
             grade=reportcard_data['grade'],
@@ -831,6 +941,8 @@ class Report_CardbyId(Resource):
 
     def patch(self, id):
         report_card_data = request.get_json()
+        if 'grade' in report_card_data and not is_grade(report_card_data['grade']):
+            return make_response({"message": "grade must be an integer"}, 400)
         report_card = Report_Card.query.filter_by(id=id).first()
 
         for attr in report_card_data:
@@ -852,16 +964,35 @@ class Report_CardbyId(Resource):
         return "record successfully deleted", 202
 
 
-class Submitted_Assignments(Resource):
+class StudentGradebook(Resource):
+    def get(self, student_id):
+        course_id = request.args.get('course_id', 0, type=int)
+        return make_response(gradebook(student_id, course_id), 200)
+
+
+class CourseGradebook(Resource):
+    def get(self, course_id):
+        return make_response(gradebook(course_id=course_id), 200)
+
+
+class GradeAnalytics(Resource):
     def get(self):
-        assignments = Submitted_Assignment.query.all()
+        sources = request.args.get('source', ','.join(SOURCES)).split(',')
+        groups = request.args.get('group_by', ','.join(GROUPS)).split(',')
+        if not set(sources) <= set(SOURCES) or not set(groups) <= set(GROUPS):
+            return make_response({"message": f"source must be in {', '.join(SOURCES)} and group_by in {', '.join(GROUPS)}"}, 400)
+
+        return json_response(grade_analytics(sorted(set(sources)), [group for group in GROUPS if group in groups]))
 
-        return make_response(
-            submitted_assignments_schema.dump(assignments), 200
-        )
+
+class Submitted_Assignments(Resource):
+    def get(self):
+        return paginate(Submitted_Assignment.query, submitted_assignments_schema)
 
     def post(self):
         assignment_data = request.get_json()
+        if assignment_data.get('grade') is not None and not is_grade(assignment_data['grade']):
+            return make_response({"message": "grade must be an integer"}, 400)
         new_assignment = Content(
             assignment_name=assignment_data['assignment_name'],
             grade=assignment_data['grade'],
@@ -888,6 +1019,8 @@ class Submitted_AssignmentbyId(Resource):
 
     def patch(self, id):
         assignment_data = request.get_json()
+        if assignment_data.get('grade') is not None and not is_grade(assignment_data['grade']):
+            return make_response({"message": "grade must be an integer"}, 400)
         assignment = Submitted_Assignment.query.filter_by(id=id).first()
 
         for attr in assignment_data:
@@ -909,15 +1042,44 @@ class Submitted_AssignmentbyId(Resource):
         return "record successfully deleted", 202
 
 
+class GradingQueue(Resource):
+    def get(self):
+        teacher_id = request.args.get('teacher_id', type=int)
+        course_id = request.args.get('course_id', type=int)
+        if teacher_id is None and course_id is None:
+            principal = current_principal()
+            if not principal or principal.role != 'teacher':
+                return make_response({"message": "Pass a teacher_id or course_id"}, 400)
+            teacher_id = principal.teacher_id
+
+        after = request.args.get('after')
+        if after is not None and not after.isdigit():
+            return make_response({"message": "after must be a submission id"}, 400)
+
+        limit = parse_limit()
+        submissions, has_more = grading_queue(teacher_id, course_id, int(after) if after else None, limit)
+        response = make_response(submitted_assignments_schema.dump(submissions), 200)
+        if has_more:
+            cursor = submissions[-1].id
+            args = request.args.to_dict()
+            args.update(after=cursor, limit=limit)
+            response.headers['X-Next-Cursor'] = str(cursor)
+            response.headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+        return response
+
+    def patch(self):
+        submissions = grade_submissions(parse_grades(request.get_json()))
+        return make_response(submitted_assignments_schema.dump(submissions), 202)
+
+
 class Events(Resource):
     def get(self):
-        events = Event.query.all()
-        return make_response(events_schema.dump(events), 200)
+        return paginate(Event.query, events_schema)
 
     def post(self):
         data = request.get_json()
 
-        course = Course.query.get(data['course_id'])
+        course = cached_get(Course, data['course_id'])
         title = ''
 
         if course:
@@ -944,6 +1106,10 @@ class Events(Resource):
             student_id=data['student_id'],
             teacher_id=data['teacher_id'],
         )
+        conflicts = find_conflicts(new_event)
+        if conflicts:
+            return make_response({"message": "Schedule conflict", "conflicts": conflicts}, 409)
+
         db.session.add(new_event)
         db.session.commit()
 
@@ -952,6 +1118,49 @@ class Events(Resource):
         return make_response(event_schema.dump(new_event), 200)
 
 
+class ScheduleConflicts(Resource):
+    def get(self):
+        owner = None
+        if request.args.get('student_id'):
+            owner = ('student', request.args.get('student_id', type=int))
+        elif request.args.get('teacher_id'):
+            owner = ('teacher', request.args.get('teacher_id', type=int))
+
+        conflicts = schedule_index().report(owner)
+        return make_response({"count": len(conflicts), "conflicts": conflicts}, 200)
+
+
+class Calendar(Resource):
+    def get(self):
+        try:
+            start = datetime.strptime(request.args['from'], "%Y-%m-%d").date()
+            end = datetime.strptime(request.args['to'], "%Y-%m-%d").date()
+        except (KeyError, ValueError):
+            return make_response({"message": "from and to must be dates like 2024-02-06"}, 400)
+
+        if end < start or (end - start).days >= app.config['CALENDAR_MAX_DAYS']:
+            return make_response({"message": f"The window must span 1 to {app.config['CALENDAR_MAX_DAYS']} days"}, 400)
+
+        if request.args.get('student_id'):
+            role, owner_id = 'student', request.args.get('student_id', type=int)
+        elif request.args.get('teacher_id'):
+            role, owner_id = 'teacher', request.args.get('teacher_id', type=int)
+        else:
+            principal = current_principal()
+            if not principal or principal.role == 'parent':
+                return make_response({"message": "Pass a student_id or teacher_id"}, 400)
+            role, owner_id = principal.role, getattr(principal, f'{principal.role}_id')
+
+        if owner_id is None:
+            return make_response({"message": f"{role}_id must be a number"}, 400)
+
+        return make_response({
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "occurrences": calendar(role, owner_id, start, end),
+        }, 200)
+
+
 class EventbyId(Resource):
     def get(self, id):
         event = Event.query.filter_by(id=id).first()
@@ -977,12 +1186,18 @@ class EventbyId(Resource):
 
         # Update the title based on the course_id
         if 'course_id' in data:
-            course = Course.query.get(data['course_id'])
+            course = cached_get(Course, data['course_id'])
             if course:
                 event.title = f"{course.course_name}"
             else:
                 event.title = "Unknown Course"
 
+        if SCHEDULE_FIELDS.intersection(data):
+            conflicts = find_conflicts(event)
+            if conflicts:
+                db.session.rollback()
+                return make_response({"message": "Schedule conflict", "conflicts": conflicts}, 409)
+
         db.session.add(event)
         db.session.commit()
 
@@ -998,11 +1213,7 @@ class EventbyId(Resource):
 
 class Saved_Contents(Resource):
     def get(self):
-        saved_Contents = Saved_Content.query.all()
-
-        return make_response(
-            saved_contents_schema.dump(saved_Contents), 200
-        )
+        return paginate(Saved_Content.query, saved_contents_schema)
 
     def post(self):
         saved_Content = request.get_json()
@@ -1032,11 +1243,7 @@ class SavedContentById(Resource):
 
 class Comments(Resource):
     def get(self):
-        comments = Comment.query.all()
-
-        return make_response(
-            comments_schema.dump(comments), 200
-        )
+        return paginate(Comment.query, comments_schema)
 
     def post(self):
         comment_data = request.get_json()
@@ -1061,7 +1268,7 @@ class CommentById(Resource):
         comment = Comment.query.filter_by(id=id).first()
 
         return make_response(
-            comment.dump(comment), 200
+            comment_schema.dump(comment), 200
         )
 
     def patch(self, id):
@@ -1087,6 +1294,88 @@ class CommentById(Resource):
         return "record successfully deleted", 202
 
 
+class Uploads(Resource):
+    def post(self):
+        upload_data = request.get_json()
+        upload = start_upload(
+            filename=upload_data.get('filename'),
+            mime_type=upload_data.get('mime_type'),
+            size=upload_data.get('size'),
+        )
+
+        return make_response(
+            upload_schema.dump(upload), 201
+        )
+
+
+class UploadbyId(Resource):
+    def get(self, id):
+        upload = Upload.query.filter_by(id=id).first()
+
+        if not upload:
+            return make_response({"message": "Upload not found"}, 404)
+
+        return make_response(
+            upload_schema.dump(upload), 200
+        )
+
+    def patch(self, id):
+        upload = Upload.query.filter_by(id=id).first()
+
+        if not upload:
+            return make_response({"message": "Upload not found"}, 404)
+
+        offset = request.headers.get('Upload-Offset', 0, type=int)
+        if not append_upload(upload, offset, request.stream):
+            return make_response(upload_schema.dump(upload), 409)
+
+        return make_response(
+            upload_schema.dump(upload), 200, {'Upload-Offset': str(upload.received)}
+        )
+
+
+class CompleteUpload(Resource):
+    def post(self, id):
+        upload = Upload.query.filter_by(id=id).first()
+
+        if not upload:
+            return make_response({"message": "Upload not found"}, 404)
+        if upload.size is not None and upload.received != upload.size:
+            return make_response(upload_schema.dump(upload), 409)
+
+        blob = db.session.get(Blob, complete_upload(upload))
+        processing = queue_upload_processing(blob.sha256)
+        db.session.commit()
+
+        return make_response(
+            blob_schema.dump(blob), 201, job_headers(processing)
+        )
+
+
+class JobbyId(Resource):
+    def get(self, id):
+        job = Job.query.filter_by(id=id).first()
+
+        if not job:
+            return make_response({"message": "Job not found"}, 404)
+
+        return make_response(
+            job_schema.dump(job), 200
+        )
+
+
+class BulkImport(Resource):
+    def post(self, role):
+        if role not in ROLES:
+            return make_response({"message": f"Cannot import {role}"}, 404)
+
+        format = 'csv' if request.mimetype == 'text/csv' else 'jsonl'
+        stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        report = import_users(role, read_rows(stream, format))
+
+        return make_response(report, 201 if report['created'] else 400)
+
+
 api.add_resource(Users, '/users')
 api.add_resource(StudentbyId, '/students/<int:id>')
 api.add_resource(Students, '/students')
@@ -1100,16 +1389,99 @@ api.add_resource(CoursebyId, '/courses/<int:id>')
 api.add_resource(Courses, '/courses')
 api.add_resource(Report_CardbyId, '/report-cards/<int:id>')
 api.add_resource(Report_Cards, '/report-cards')
+api.add_resource(StudentGradebook, '/gradebook/students/<int:student_id>')
+api.add_resource(CourseGradebook, '/gradebook/courses/<int:course_id>')
+api.add_resource(GradeAnalytics, '/analytics/grades')
 api.add_resource(AssignmentbyId, '/assignments/<int:id>')
 api.add_resource(Assignments, '/assignments')
 api.add_resource(Submitted_AssignmentbyId, '/submitted-assignments/<int:id>')
 api.add_resource(Submitted_Assignments, '/submitted-assignments')
+api.add_resource(GradingQueue, '/grading-queue')
 api.add_resource(EventbyId, '/events/<int:id>')
 api.add_resource(Events, '/events')
+api.add_resource(Calendar, '/calendar')
+api.add_resource(ScheduleConflicts, '/schedule/conflicts')
 api.add_resource(SavedContentById, '/saved_contents/<int:id>')
 api.add_resource(Saved_Contents, '/saved_contents')
 api.add_resource(CommentById, '/comments/<int:id>')
 api.add_resource(Comments, '/comments')
+api.add_resource(BulkImport, '/bulk-import/<string:role>')
+api.add_resource(CompleteUpload, '/uploads/<string:id>/complete')
+api.add_resource(UploadbyId, '/uploads/<string:id>')
+api.add_resource(Uploads, '/uploads')
+api.add_resource(JobbyId, '/jobs/<int:id>')
+
+
+@app.before_request
+def start_job_workers():
+    if app.config['JOB_WORKER_THREADS']:
+        ensure_workers()
+
+@app.before_request
+def start_session_sweep():
+    ensure_session_sweeper(app, db)
+
+@app.cli.command('sweep-sessions')
+def sweep_sessions_command():
+    removed = sweep_sessions(app, db)
+    print(f"Removed {removed} expired sessions")
+
+
+@app.cli.command('rebuild-gradebook')
+def rebuild_gradebook_command():
+    rebuild_gradebook()
+    print("Gradebook rebuilt")
+
+
+@app.cli.command('check-serializers')
+@click.option('--limit', default=200, help='Rows to dump per schema.')
+def check_serializers_command(limit):
+    with app.test_request_context():
+        problems = check_serializers(SCHEMAS, limit)
+    for schema, fields, row, compiled, expected in problems:
+        print(f"{schema} {','.join(fields)} {row!r}:\n    compiled {compiled}\n    expected {expected}")
+    if problems:
+        raise SystemExit(1)
+    print("Compiled serializers match marshmallow")
+
+
+@app.cli.command('check-query-plans')
+@click.option('--email', help='Log in as this user to cover session endpoints.')
+@click.option('--password')
+def check_query_plans_command(email, password):
+    problems = check_query_plans(email=email, password=password)
+    for path, table, statement in problems:
+        print(f"{path}: full scan of {table}\n    {' '.join(statement.split())}")
+    if problems:
+        raise SystemExit(1)
+    print("No full table scans")
+
+
+@app.cli.command('worker')
+@click.option('--threads', default=2, show_default=True, help='Number of worker threads.')
+def worker_command(threads):
+    stop = threading.Event()
+    workers = start_workers(threads, stop)
+    print(f"Processing jobs with {threads} threads, press Ctrl+C to stop")
+    try:
+        while any(worker.is_alive() for worker in workers):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop.set()
+
+
+@app.cli.command('import-users')
+@click.argument('role', type=click.Choice(list(ROLES)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_users_command(role, path):
+    format = 'csv' if path.endswith('.csv') else 'jsonl'
+    with open(path, newline='', encoding='utf-8') as f:
+        report = import_users(role, read_rows(f, format))
+
+    print(f"Imported {report['created']} {role}")
+    for error in report['errors']:
+        print(f"Row {error['row']}: {error['error']}")
+
 
 if __name__ == '__main__':
     app.run(port=5555, debug=True)
@@ -0,0 +1,99 @@
+"""Time /analytics/grades over a generated database of report card and
+submission grades, loaded into NumPy arrays and, with --baseline, through
+ORM objects and Python loops.
+
+    python bench_analytics.py --rows 1000000 --baseline
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+from config import db
+from analytics import grade_columns, cohort_statistics
+from models import Course, Teacher, Assignment, Report_Card, Submitted_Assignment
+
+
+def setup(path, rows, courses, topics):
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    rng = random.Random(1)
+    start = datetime(2023, 1, 1)
+
+    def day():
+        return start + timedelta(days=rng.randrange(730))
+
+    with engine.begin() as connection:
+        connection.execute(insert(Course), [
+            {"id": n, "course_name": f"Course {n}", "description": "Benchmark course"} for n in range(1, courses + 1)
+        ])
+        connection.execute(insert(Teacher), [
+            {"id": n, "firstname": "Bench", "lastname": str(n), "personal_email": f"t{n}@example.com",
+             "email": f"t{n}@lecturer.goldworth.com", "_password": f"pw{n}"}
+            for n in range(1, courses // 4 + 2)
+        ])
+        connection.execute(insert(Assignment), [
+            {"assignment_name": f"Assignment {n}", "topic": f"Topic {n % topics}", "content": "Benchmark",
+             "course_id": course, "teacher_id": course // 4 + 1}
+            for course in range(1, courses + 1) for n in range(10)
+        ])
+        for offset in range(0, rows // 2, 50000):
+            size = min(50000, rows // 2 - offset)
+            connection.execute(insert(Report_Card), [
+                {"topic": f"Topic {rng.randrange(topics)}", "grade": min(max(int(rng.gauss(65, 15)), 0), 100),
+                 "course_id": (course := rng.randrange(1, courses + 1)), "teacher_id": course // 4 + 1,
+                 "student_id": rng.randrange(1, 20000), "created_at": day()}
+                for _ in range(size)
+            ])
+            connection.execute(insert(Submitted_Assignment), [
+                {"assignment_name": f"Assignment {rng.randrange(10)}", "grade": min(max(int(rng.gauss(70, 12)), 0), 100),
+                 "is_graded": True, "course_id": rng.randrange(1, courses + 1),
+                 "student_id": rng.randrange(1, 20000), "created_at": day()}
+                for _ in range(size)
+            ])
+    return engine
+
+
+def vectorized(engine):
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        columns = grade_columns(connection)
+    loaded = time.perf_counter()
+    cohort_statistics(columns)
+    return loaded - started, time.perf_counter() - loaded
+
+
+def baseline(engine):
+    """Per course statistics only, the way a view looping over the ORM
+    objects would compute them."""
+    started = time.perf_counter()
+    with Session(engine) as session:
+        grades = [*session.query(Report_Card).all(), *session.query(Submitted_Assignment).filter_by(is_graded=True).all()]
+    loaded = time.perf_counter()
+    by_course = {}
+    for grade in grades:
+        by_course.setdefault(grade.course_id, []).append(grade.grade)
+    for values in by_course.values():
+        statistics.mean(values), statistics.pstdev(values), statistics.quantiles(values, n=10) if len(values) > 1 else None
+    return loaded - started, time.perf_counter() - loaded
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--courses', type=int, default=400)
+    parser.add_argument('--topics', type=int, default=60)
+    parser.add_argument('--baseline', action='store_true', help='Also time the ORM and Python loop version.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = setup(os.path.join(tmp, 'bench.db'), args.rows, args.courses, args.topics)
+        runs = [('numpy', vectorized)] + ([('orm loop', baseline)] if args.baseline else [])
+        for name, run in runs:
+            load, compute = run(engine)
+            print(f"  {name:<9} load {load:>7.2f}s  compute {compute:>7.2f}s  total {load + compute:>7.2f}s")
+        engine.dispose()
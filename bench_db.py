@@ -0,0 +1,107 @@
+"""Concurrent read/write throughput of the SQLite database, with the default
+engine settings and with the tuned ones from database.py.
+
+    python bench_db.py --readers 8 --writers 4 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import date
+from sqlalchemy import create_engine, event, insert, select, func
+from sqlalchemy.exc import OperationalError
+from config import app, db
+from database import read_only_url, sqlite_pragmas
+from models import Course, Event
+
+
+def make_engine(path, tuned, read_only=False):
+    url = f'sqlite:///{path}'
+    if not tuned:
+        return create_engine(url)
+
+    if read_only:
+        url = read_only_url(url)
+    engine = create_engine(url, pool_size=app.config['DATABASE_POOL_SIZE'])
+    pragmas = sqlite_pragmas(app, read_only=read_only)
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        for pragma in pragmas:
+            dbapi_connection.execute(f"PRAGMA {pragma}")
+    return engine
+
+
+def setup(path, tuned):
+    engine = make_engine(path, tuned)
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Course), [
+            {"course_name": f"Course {n}", "description": "Benchmark course"} for n in range(200)
+        ])
+    engine.dispose()
+
+
+def reader(path, tuned, seconds, results):
+    engine = make_engine(path, tuned, read_only=True)
+    done = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            with engine.connect() as connection:
+                connection.execute(select(Course)).all()
+                connection.execute(select(func.count()).select_from(Event)).scalar()
+            done += 1
+        except OperationalError:
+            errors += 1
+    results.put(('read', done, errors))
+
+
+def writer(path, tuned, seconds, results):
+    engine = make_engine(path, tuned)
+    done = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            with engine.begin() as connection:
+                connection.execute(insert(Event).values(title='Benchmark', start=date.today(), course_id=1))
+            done += 1
+        except OperationalError:
+            errors += 1
+    results.put(('write', done, errors))
+
+
+def run(tuned, readers, writers, seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        setup(path, tuned)
+
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=reader, args=(path, tuned, seconds, results)) for _ in range(readers)]
+        processes += [multiprocessing.Process(target=writer, args=(path, tuned, seconds, results)) for _ in range(writers)]
+        for process in processes:
+            process.start()
+
+        totals = {'read': [0, 0], 'write': [0, 0]}
+        for _ in processes:
+            kind, done, errors = results.get()
+            totals[kind][0] += done
+            totals[kind][1] += errors
+        for process in processes:
+            process.join()
+
+    for kind, (done, errors) in totals.items():
+        print(f"  {kind:<5} {done / seconds:>10.1f} ops/s  {errors} locked errors")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    for tuned in (False, True):
+        print("tuned" if tuned else "default")
+        run(tuned, args.readers, args.writers, args.seconds)
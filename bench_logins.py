@@ -0,0 +1,94 @@
+"""Login storm against a running server: many clients logging in at once,
+while one more client keeps fetching an unrelated endpoint to show whether
+other requests queue behind the password checks.
+
+    gunicorn -w 4 -b 127.0.0.1:5555 app:app
+    python bench_logins.py --url http://127.0.0.1:5555 --email lee.ann@lecturer.goldworth.com --password pw1 --clients 64 --seconds 20
+"""
+import argparse
+import json
+import threading
+import time
+from collections import Counter
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+
+def fetch(url, body=None):
+    """Status code of a GET, or of a JSON POST when there is a `body`."""
+    data = json.dumps(body).encode() if body is not None else None
+    request = Request(url, data=data, headers={'Content-Type': 'application/json'} if data else {})
+    try:
+        with urlopen(request, timeout=60) as response:
+            response.read()
+            return response.status
+    except HTTPError as e:
+        return e.code
+    except (URLError, OSError):
+        return 'error'
+
+
+def percentile(latencies, p):
+    if not latencies:
+        return 0.0
+    ordered = sorted(latencies)
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+
+def log_in(url, email, password, deadline, latencies, statuses, lock):
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        status = fetch(f'{url}/login', {"email": email, "password": password})
+        took = time.monotonic() - started
+        with lock:
+            statuses[status] += 1
+            if status == 200:
+                latencies.append(took)
+        if status == 503:
+            # what a client honouring Retry-After would do, shortened
+            time.sleep(0.5)
+
+
+def bystander(url, path, deadline, latencies):
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        if fetch(f'{url}{path}') == 200:
+            latencies.append(time.monotonic() - started)
+        time.sleep(0.05)
+
+
+def report(name, latencies, seconds):
+    print(
+        f"  {name:<10} {len(latencies) / seconds:>8.1f} req/s  "
+        f"p50 {percentile(latencies, 50) * 1000:>8.1f} ms  "
+        f"p95 {percentile(latencies, 95) * 1000:>8.1f} ms  "
+        f"p99 {percentile(latencies, 99) * 1000:>8.1f} ms"
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5555')
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--bystander', default='/courses', help='Endpoint fetched alongside the logins.')
+    args = parser.parse_args()
+
+    url = args.url.rstrip('/')
+    deadline = time.monotonic() + args.seconds
+    logins, others, statuses, lock = [], [], Counter(), threading.Lock()
+    threads = [
+        threading.Thread(target=log_in, args=(url, args.email, args.password, deadline, logins, statuses, lock))
+        for _ in range(args.clients)
+    ]
+    threads.append(threading.Thread(target=bystander, args=(url, args.bystander, deadline, others)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    report('logins', logins, args.seconds)
+    report(args.bystander, others, args.seconds)
+    print(f"  responses  {', '.join(f'{status}: {count}' for status, count in sorted(statuses.items(), key=str))}")
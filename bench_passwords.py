@@ -0,0 +1,57 @@
+"""Login latency at each bcrypt cost on this host, for picking a
+BCRYPT_LOG_ROUNDS that keeps p99 logins within budget, and the one-off cost
+of the first login after the setting changes, which also rehashes.
+
+    python bench_passwords.py --rounds 10 11 12 13 --logins 20 --budget 250
+"""
+import argparse
+import time
+from passwords import check, generate, hash_rounds
+
+
+def percentile(latencies, p):
+    ordered = sorted(latencies)
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - started
+
+
+def login_latencies(hashed, logins):
+    return [timed(check, b'correct horse', hashed) for _ in range(logins)]
+
+
+def rehashing_login(hashed, rounds):
+    # what Login.post does for a hash of another cost: check, then hash again
+    started = time.perf_counter()
+    check(b'correct horse', hashed)
+    if hash_rounds(hashed.decode()) != rounds:
+        generate(b'correct horse', rounds)
+    return time.perf_counter() - started
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, nargs='+', default=[10, 11, 12, 13])
+    parser.add_argument('--logins', type=int, default=20)
+    parser.add_argument('--budget', type=float, default=250, help='p99 login budget in ms.')
+    args = parser.parse_args()
+
+    hashes = {rounds: generate(b'correct horse', rounds) for rounds in args.rounds}
+    print("login (check only)")
+    for rounds, hashed in hashes.items():
+        latencies = login_latencies(hashed, args.logins)
+        p99 = percentile(latencies, 99) * 1000
+        verdict = "within budget" if p99 <= args.budget else "over budget"
+        print(f"  cost {rounds:>2}  p50 {percentile(latencies, 50) * 1000:>8.1f} ms  p99 {p99:>8.1f} ms  {verdict}")
+
+    print("first login after changing the cost (check + rehash)")
+    lowest = min(args.rounds)
+    for rounds in args.rounds:
+        if rounds == lowest:
+            continue
+        took = rehashing_login(hashes[lowest], rounds) * 1000
+        print(f"  cost {lowest:>2} -> {rounds:>2}  {took:>8.1f} ms")
@@ -0,0 +1,89 @@
+"""Dump throughput of the compiled serializers against plain marshmallow,
+for /students, /courses and /users sized pages of a generated database,
+plus /users with the per object URLFor links it used to have.
+
+    python bench_serializers.py --students 2000 --courses 200 --rounds 5
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from config import db, mash
+from app import app, students_schema, courses_schema, users_schema
+from loaders import eager
+from serializers import uncompiled
+from models import User, Student, Teacher, Course, Content, Report_Card, Submitted_Assignment
+
+
+class URLForUserSchema(mash.SQLAlchemySchema):
+    class Meta:
+        model = User
+
+    email = mash.auto_field()
+    student_id = mash.auto_field()
+    teacher_id = mash.auto_field()
+    parent_id = mash.auto_field()
+    student_url = mash.Hyperlinks({"student": mash.URLFor("studentbyid", values=dict(id="<student_id>")), "students_list": mash.URLFor("students")})
+    parent_url = mash.Hyperlinks({"parent": mash.URLFor("parentbyid", values=dict(id="<parent_id>")), "parents_list": mash.URLFor("parents")})
+    teacher_url = mash.Hyperlinks({"teacher": mash.URLFor("teacherbyid", values=dict(id="<teacher_id>")), "teachers_list": mash.URLFor("teachers")})
+
+
+def setup(path, students, courses):
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    rng = random.Random(1)
+    with Session(engine) as session:
+        teachers = [
+            Teacher(firstname='Bench', lastname=str(n), personal_email=f't{n}@example.com',
+                    email=f't{n}@lecturer.goldworth.com', _password=f'tpw{n}', expertise='Benchmarks',
+                    user=[User(email=f't{n}@lecturer.goldworth.com', _password=f'tpw{n}')])
+            for n in range(max(courses // 4, 1))
+        ]
+        all_courses = [
+            Course(course_name=f'Course {n}', description='Benchmark course', teachers=rng.sample(teachers, min(2, len(teachers))),
+                   content=[Content(content_name=f'Notes {n}.{k}', description='Notes', content_type='pdf') for k in range(3)])
+            for n in range(courses)
+        ]
+        for n in range(students):
+            session.add(Student(
+                firstname='Bench', lastname=str(n), personal_email=f's{n}@example.com',
+                email=f's{n}@student.goldworth.com', _password=f'spw{n}',
+                user=[User(email=f's{n}@student.goldworth.com', _password=f'spw{n}')],
+                courses=rng.sample(all_courses, min(4, courses)),
+                report_card=[Report_Card(topic=f'Topic {k}', grade=rng.randrange(101), course_id=1) for k in range(3)],
+                assignments=[Submitted_Assignment(assignment_name=f'Assignment {k}', grade=rng.randrange(101), course_id=1) for k in range(3)],
+            ))
+        session.add_all(all_courses)
+        session.commit()
+    return engine
+
+
+def throughput(schema, rows, rounds):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        schema.dump(rows)
+    return len(rows) * rounds / (time.perf_counter() - started)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--courses', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = setup(os.path.join(tmp, 'bench.db'), args.students, args.courses)
+        with Session(engine) as session, app.test_request_context():
+            for name, schema, model in (('students', students_schema, Student), ('courses', courses_schema, Course), ('users', users_schema, User)):
+                rows = eager(session.query(model), schema).all()
+                with uncompiled():
+                    before = throughput(schema, rows, args.rounds)
+                after = throughput(schema, rows, args.rounds)
+                print(f"  {name:<9} marshmallow {before:>9.0f} rows/s  compiled {after:>9.0f} rows/s  {after / before:>5.1f}x")
+            users = session.query(User).all()
+            print(f"  users with URLFor links {throughput(URLForUserSchema(many=True), users, args.rounds):>9.0f} rows/s")
+        engine.dispose()
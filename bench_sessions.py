@@ -0,0 +1,83 @@
+"""Per-request session overhead of each SESSION_TYPE backend: requests that
+read and write the session, against the same route on an app without
+server-side sessions.
+
+    python bench_sessions.py --requests 2000 --file-dir /dev/shm/goldworth-bench
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from flask import Flask, session
+from flask_session import Session
+from flask_sqlalchemy import SQLAlchemy
+from sessions import configure_session_backend, configure_session_serializer
+
+
+def touch():
+    session['user'] = 'bench@student.goldworth.com'
+    session['hits'] = session.get('hits', 0) + 1
+    return ''
+
+
+def make_app(backend, tmp, args):
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY='bench',
+        SESSION_TYPE=backend,
+        SESSION_FILE_DIR=args.file_dir or os.path.join(tmp, 'sessions'),
+        SESSION_REDIS_URL=args.redis_url,
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmp, 'sessions.db')}",
+    )
+    db = SQLAlchemy(app)
+    configure_session_backend(app, db)
+    Session(app)
+    configure_session_serializer(app)
+    with app.app_context():
+        db.create_all()
+
+    app.add_url_rule('/touch', view_func=touch)
+    return app
+
+
+def per_request(client, path, requests):
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get(path)
+    return (time.perf_counter() - started) / requests
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--file-dir', help='SESSION_FILE_DIR for the filesystem backend, e.g. under /dev/shm.')
+    parser.add_argument('--redis-url', default='redis://localhost:6379/0')
+    args = parser.parse_args()
+
+    # Flask's own signed cookie session, with nothing stored server side
+    cookie_app = Flask(__name__)
+    cookie_app.config['SECRET_KEY'] = 'bench'
+    cookie_app.add_url_rule('/touch', view_func=touch)
+    client = cookie_app.test_client()
+    client.get('/touch')
+    baseline = per_request(client, '/touch', args.requests)
+    print(f"  {'cookie':<11} {baseline * 1e6:>9.1f} us/request")
+
+    for backend in ('sqlalchemy', 'filesystem', 'redis'):
+        tmp = tempfile.mkdtemp()
+        try:
+            try:
+                app = make_app(backend, tmp, args)
+                client = app.test_client()
+                client.get('/touch')
+            except Exception as e:
+                # redis needs the package and a server speaking its protocol
+                print(f"  {backend:<11} skipped: {e}")
+                continue
+            touched = per_request(client, '/touch', args.requests)
+            print(f"  {backend:<11} {touched * 1e6:>9.1f} us/request  overhead {(touched - baseline) * 1e6:>9.1f} us")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if args.file_dir and backend == 'filesystem':
+                shutil.rmtree(args.file_dir, ignore_errors=True)
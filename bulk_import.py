@@ -0,0 +1,162 @@
+import csv
+import json
+import re
+from itertools import islice
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from config import app, db
+from models import Student, Teacher, Parent, User, Course, course_student, course_teacher
+from passwords import hash_passwords
+
+
+email_regex = re.compile(r'[a-zA-Z-_\.0-9]+@[a-zA-Z-_]+\.[a-zA-Z]+[a-zA-Z]?')
+
+ROLES = {
+    'students': (Student, 'student_id', course_student, ['firstname', 'lastname', 'personal_email', 'email', 'password'], ['parent_id', 'image_url']),
+    'teachers': (Teacher, 'teacher_id', course_teacher, ['firstname', 'lastname', 'personal_email', 'email', 'password'], ['expertise', 'department', 'image_url']),
+    'parents': (Parent, 'parent_id', None, ['firstname', 'lastname', 'email', 'password'], ['image_url']),
+}
+
+
+def read_rows(stream, format):
+    """Yield dicts from a CSV or JSON lines text stream. A row that can't be
+    parsed is yielded as the ValueError, to be reported with its number."""
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        while True:
+            try:
+                yield next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                yield ValueError(f"Invalid CSV: {e}")
+    else:
+        for line in stream:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield ValueError(f"Invalid JSON: {e}")
+
+
+def course_ids(row):
+    ids = row.get('course_ids') or []
+    if isinstance(ids, str):
+        ids = [i for i in re.split(r'[;,\s]+', ids) if i]
+    return [int(i) for i in ids]
+
+
+def validate(role, rows, start):
+    model, _, association, required, optional = ROLES[role]
+    valid, errors = [], []
+    seen = set()
+
+    emails = {row['email'] for row in rows if isinstance(row, dict) and isinstance(row.get('email'), str)}
+    taken = set(db.session.scalars(select(User.email).where(User.email.in_(emails))))
+    taken.update(db.session.scalars(select(model.email).where(model.email.in_(emails))))
+
+    # foreign keys aren't enforced by SQLite, so links to missing courses would go in silently
+    referenced = set()
+    for row in rows:
+        try:
+            referenced.update(course_ids(row))
+        except (ValueError, TypeError, AttributeError):
+            pass
+    known = set(db.session.scalars(select(Course.id).where(Course.id.in_(referenced))))
+
+    for number, row in enumerate(rows, start):
+        try:
+            if isinstance(row, ValueError):
+                raise row
+            if not isinstance(row, dict):
+                raise ValueError("Each row must be an object")
+            missing = [field for field in required if not row.get(field)]
+            if missing:
+                raise ValueError(f"Missing {', '.join(missing)}")
+            if not isinstance(row['email'], str) or not email_regex.match(row['email']):
+                raise ValueError("Please provide a valid email address!")
+            if row['email'] in taken or row['email'] in seen:
+                raise ValueError(f"{row['email']} already exists")
+            courses = course_ids(row)
+            unknown = [course_id for course_id in courses if course_id not in known]
+            if association is not None and unknown:
+                raise ValueError(f"No courses with ids {', '.join(map(str, unknown))}")
+        except (ValueError, TypeError, AttributeError) as e:
+            errors.append({"row": number, "error": str(e)})
+            continue
+
+        seen.add(row['email'])
+        values = {field: row[field] for field in required if field != 'password'}
+        values.update({field: row[field] for field in optional if row.get(field) not in (None, '')})
+        valid.append((number, values, str(row['password']), courses))
+    return valid, errors
+
+
+def insert_batch(role, batch, hashes):
+    model, foreign_key, association, _, _ = ROLES[role]
+    for (_, values, _, _), password_hash in zip(batch, hashes):
+        values['_password'] = password_hash
+
+    ids = db.session.scalars(
+        insert(model).returning(model.id, sort_by_parameter_order=True),
+        [values for _, values, _, _ in batch],
+    ).all()
+
+    db.session.execute(insert(User), [
+        {"email": values['email'], "_password": values['_password'], foreign_key: id}
+        for (_, values, _, _), id in zip(batch, ids)
+    ])
+
+    links = [
+        {foreign_key: id, "course_id": course_id}
+        for (_, _, _, courses), id in zip(batch, ids) for course_id in courses
+    ]
+    if association is not None and links:
+        db.session.execute(insert(association), links)
+
+
+def import_users(role, rows):
+    """Insert students, teachers or parents with their users and course links.
+
+    Rows are validated, hashed on the password pool and inserted in
+    batches of `BULK_IMPORT_BATCH_SIZE`. Rows that fail are reported by
+    number instead of aborting the import.
+    """
+    batch_size = app.config['BULK_IMPORT_BATCH_SIZE']
+    rounds = app.config['BCRYPT_LOG_ROUNDS']
+    rows = iter(rows)
+    created, errors, start = 0, [], 1
+
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+
+        batch, invalid = validate(role, chunk, start)
+        errors.extend(invalid)
+        start += len(chunk)
+        if not batch:
+            continue
+
+        passwords = [password.encode('utf-8') for _, _, password, _ in batch]
+        hashes = [h.decode('utf-8') for h in hash_passwords(passwords, rounds)]
+
+        try:
+            insert_batch(role, batch, hashes)
+            db.session.commit()
+            created += len(batch)
+            continue
+        except IntegrityError:
+            db.session.rollback()
+
+        # something in the batch clashed with the database, find out which row
+        for row, password_hash in zip(batch, hashes):
+            try:
+                insert_batch(role, [row], [password_hash])
+                db.session.commit()
+                created += 1
+            except IntegrityError as e:
+                db.session.rollback()
+                errors.append({"row": row[0], "error": str(e.orig)})
+
+    return {"created": created, "errors": sorted(errors, key=lambda e: e["row"])}
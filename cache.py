@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class LRUCache:
+    """Thread-safe LRU mapping with an optional per-entry TTL in seconds.
+    `on_evict(key, value)` is called, outside the lock, for every entry
+    dropped to make room or found expired, so that indexes kept next to
+    the cache can forget it too."""
+
+    def __init__(self, maxsize=1024, ttl=None, on_evict=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            expired = entry is not None and entry[1] is not None and entry[1] < time.monotonic()
+            if entry is None or expired:
+                if expired:
+                    del self._data[key]
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        if expired and self.on_evict:
+            self.on_evict(key, entry[0])
+        return default
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        evicted = []
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted.append(self._data.popitem(last=False))
+                self.evictions += 1
+        if self.on_evict:
+            for old_key, (old_value, _) in evicted:
+                self.on_evict(old_key, old_value)
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[0] if entry else None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def invalidate_on_commit(name, keys_for, invalidate):
+    """Collect `keys_for(obj)` for every object written in a flush and hand
+    the union to `invalidate(keys)` once the transaction commits."""
+
+    @event.listens_for(Session, 'after_flush')
+    def collect(session, flush_context):
+        keys = session.info.setdefault(name, set())
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            keys.update(keys_for(obj))
+
+    @event.listens_for(Session, 'after_commit')
+    def apply(session):
+        keys = session.info.pop(name, None)
+        if keys:
+            invalidate(keys)
+
+    @event.listens_for(Session, 'after_soft_rollback')
+    def discard(session, previous_transaction):
+        session.info.pop(name, None)
@@ -1,3 +1,4 @@
+import os
 from flask import Flask
 from flask_bcrypt import Bcrypt
 from flask_marshmallow import Marshmallow
@@ -7,27 +8,93 @@ from flask_restful import Api
 from flask_sqlalchemy import SQLAlchemy
 from flask_session import Session
 from flask_admin import Admin
+from sessions import configure_session_backend, configure_session_serializer
+from database import RoutingSession, configure_database, configure_engines, configure_routing
+from responses import configure_responses
 
 app = Flask(__name__)
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 app.config['FLASK_ADMIN_SWATCH'] = 'cerulean'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///lms.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///lms.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SESSION_TYPE']='sqlalchemy'
-app.config['SESSION_SQLALCHEMY']=db
+app.config['DATABASE_POOL_SIZE'] = int(os.environ.get('DATABASE_POOL_SIZE', 5))
+app.config['DATABASE_READ_POOL_SIZE'] = int(os.environ.get('DATABASE_READ_POOL_SIZE', 10))
+app.config['DATABASE_MAX_OVERFLOW'] = int(os.environ.get('DATABASE_MAX_OVERFLOW', 10))
+app.config['DATABASE_POOL_TIMEOUT'] = 10
+app.config['DATABASE_READ_ROUTING'] = os.environ.get('DATABASE_READ_ROUTING', '1') == '1'
+app.config['DATABASE_STICKY_SECONDS'] = 5
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+app.config['SQLITE_MMAP_SIZE'] = 256 * 1024 * 1024
+# a negative cache_size is in KiB
+app.config['SQLITE_CACHE_SIZE'] = -64 * 1024
+app.config['SESSION_TYPE'] = os.environ.get('SESSION_TYPE', 'sqlalchemy')
+app.config['SESSION_REDIS_URL'] = os.environ.get('SESSION_REDIS_URL', 'redis://localhost:6379/0')
+app.config['SESSION_SWEEP_INTERVAL'] = int(os.environ.get('SESSION_SWEEP_INTERVAL', 3600))
+app.config['SESSION_SWEEP_BATCH_SIZE'] = 500
+if os.environ.get('SESSION_FILE_DIR'):
+    app.config['SESSION_FILE_DIR'] = os.environ['SESSION_FILE_DIR']
 app.config['SECRET_KEY'] = 'no_key'
 app.config["IMAGE_UPLOAD_PATH"] = "image_uploads"
 app.config["FILE_UPLOAD_PATH"] = "file_uploads"
+app.config["BLOB_STORE_PATH"] = "blob_store"
+app.config['THUMBNAIL_CACHE_PATH'] = os.path.join(app.config["BLOB_STORE_PATH"], "thumbnails")
+app.config['THUMBNAIL_CACHE_MAX_BYTES'] = 256 * 1024 * 1024
+app.config['THUMBNAIL_SIZES'] = (40, 80, 200)
+app.config['THUMBNAIL_QUALITY'] = 85
+app.config['FILE_OFFLOAD'] = os.environ.get('FILE_OFFLOAD')
+app.config['FILE_OFFLOAD_ROOT'] = os.path.abspath(os.path.dirname(__file__))
+app.config['FILE_ACCEL_PREFIX'] = os.environ.get('FILE_ACCEL_PREFIX', '/protected')
+app.config['USE_X_SENDFILE'] = app.config['FILE_OFFLOAD'] == 'x-sendfile'
+app.config['PAGINATION_DEFAULT_LIMIT'] = 100
+app.config['PAGINATION_MAX_LIMIT'] = 500
+app.config['DASHBOARD_CACHE_SIZE'] = 1024
+app.config['DASHBOARD_CACHE_TTL'] = 300
+app.config['PRINCIPAL_CACHE_SIZE'] = 4096
+app.config['PRINCIPAL_CACHE_TTL'] = 600
+app.config['CALENDAR_CACHE_SIZE'] = 2048
+app.config['CALENDAR_CACHE_TTL'] = 600
+app.config['CALENDAR_MAX_DAYS'] = 366
+app.config['SCHEDULE_INDEX_TTL'] = 300
+app.config['ANALYTICS_CACHE_SIZE'] = 64
+app.config['ANALYTICS_CACHE_TTL'] = 900
+app.config['ANALYTICS_FETCH_SIZE'] = 50000
+app.config['RESPONSE_CACHE_SIZE'] = 512
+# table versions are counted per process, so with several worker processes
+# a write made in another one is only picked up once the entry expires
+app.config['RESPONSE_CACHE_TTL'] = 300
+app.config['IDENTITY_CACHE_SIZE'] = 2048
+app.config['IDENTITY_CACHE_TTL'] = 300
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+app.config['PASSWORD_POOL_WORKERS'] = int(os.environ.get('PASSWORD_POOL_WORKERS', max((os.cpu_count() or 2) // 2, 1)))
+app.config['PASSWORD_POOL_QUEUE_DEPTH'] = int(os.environ.get('PASSWORD_POOL_QUEUE_DEPTH', 16))
+app.config['PASSWORD_POOL_RETRY_AFTER'] = 2
+app.config['BULK_IMPORT_BATCH_SIZE'] = 500
+app.config['JOB_WORKER_THREADS'] = int(os.environ.get('JOB_WORKER_THREADS', 2))
+app.config['JOB_POLL_INTERVAL'] = 1.0
+app.config['JOB_MAX_ATTEMPTS'] = 5
+app.config['JOB_BACKOFF_SECONDS'] = 5
+app.config['JOB_LEASE_SECONDS'] = 300
+app.config['UPLOAD_SCAN_COMMAND'] = os.environ.get('UPLOAD_SCAN_COMMAND')
+app.config['COMPRESS_MIMETYPES'] = ('application/json',)
+app.config['COMPRESS_MIN_SIZE'] = 1024
+app.config['COMPRESS_GZIP_LEVEL'] = 6
+app.config['COMPRESS_BROTLI_QUALITY'] = 5
 
 
 migrate = Migrate(app, db)
 CORS(app)
 
+configure_session_backend(app, db)
 Session(app)
+configure_session_serializer(app)
 bcrypt = Bcrypt(app)
 mash = Marshmallow(app)
 api = Api(app)
+configure_database(app)
 db.init_app(app)
+configure_engines(app, db)
+configure_routing(app)
+configure_responses(app, api)
 admin = Admin(app, name="GoldWorth", template_mode='bootstrap4')
@@ -0,0 +1,278 @@
+import itertools
+import threading
+import time
+from datetime import timedelta
+from sqlalchemy import inspect, select
+from config import app, db
+from cache import invalidate_on_commit
+from intervals import IntervalTree
+from metrics import register
+from models import Event, Course, Student, Teacher, course_student, course_teacher
+from schedule import entry_for, weekday
+
+
+_sequence = itertools.count()
+
+
+def seconds(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def weekdays(entry):
+    if entry.days is not None:
+        return entry.days
+    span = min((entry.last - entry.first).days, 6)
+    return frozenset(weekday(entry.first + timedelta(days=n)) for n in range(span + 1))
+
+
+def time_range(entry):
+    """Seconds since midnight the entry takes up, as a closed interval, or
+    None for all day or untimed entries."""
+    if entry.all_day or entry.start_time is None or entry.end_time is None:
+        return None
+    start, end = seconds(entry.start_time), seconds(entry.end_time)
+    # back to back classes don't clash, so the end second is left out
+    return (start, end - 1) if end > start else None
+
+
+def meets_together(a, b, day):
+    """Whether `a` and `b` share a date falling on weekday `day`."""
+    first, last = max(a.first, b.first), min(a.last, b.last)
+    if first > last:
+        return False
+    span = (last - first).days
+    return span >= 6 or any(weekday(first + timedelta(days=n)) == day for n in range(span + 1))
+
+
+def clashes(a, b, day):
+    # an event held as part of a course doesn't clash with that course
+    if a.course_id is not None and a.course_id == b.course_id:
+        return False
+    return meets_together(a, b, day)
+
+
+def describe(entry):
+    return {
+        "type": entry.kind,
+        "id": entry.id,
+        "title": entry.title,
+        "course_id": entry.course_id,
+        "daysOfWeek": sorted(weekdays(entry)),
+        "startTime": entry.start_time.strftime("%H:%M") if entry.start_time else None,
+        "endTime": entry.end_time.strftime("%H:%M") if entry.end_time else None,
+        "startRecur": entry.first.isoformat(),
+        "endRecur": entry.last.isoformat(),
+    }
+
+
+class ScheduleIndex:
+    """Everyone's timed events and classes, as one interval tree over the
+    time of day per owner and weekday. Date ranges are compared on the few
+    intervals that overlap in time."""
+
+    def __init__(self):
+        self.trees = {}
+        self.entries = {}
+        self.placements = {}
+        self.course_owners = {}
+        self.built_at = time.monotonic()
+        self.lock = threading.RLock()
+
+    def owners_of(self, key, owners=None):
+        if owners is not None:
+            return owners
+        if key[0] == 'course':
+            return self.course_owners.get(key[1], set())
+        return set()
+
+    def place(self, entry, owners=None):
+        key = (entry.kind, entry.id)
+        with self.lock:
+            owners = set(self.owners_of(key, owners))
+            self.remove(key)
+            span = time_range(entry)
+            if span is None:
+                return
+            self.entries[key] = entry
+            self.placements[key] = set()
+            for owner in owners:
+                for day in weekdays(entry):
+                    self.trees.setdefault((*owner, day), IntervalTree()).insert(*span, key)
+                    self.placements[key].add((*owner, day))
+
+    def remove(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+            for tree_key in self.placements.pop(key, ()):
+                self.trees[tree_key].remove(key)
+
+    def enroll(self, owner, course_id, enrolled):
+        with self.lock:
+            owners = self.course_owners.setdefault(course_id, set())
+            if enrolled:
+                owners.add(owner)
+            else:
+                owners.discard(owner)
+            entry = self.entries.get(('course', course_id))
+            if entry is not None:
+                self.place(entry, owners)
+
+    def conflicts(self, entry, owners):
+        """(owner, weekday, other entry) for everything `entry` would clash
+        with on the calendars of `owners`."""
+        span = time_range(entry)
+        if span is None:
+            return []
+
+        own_key = (entry.kind, entry.id)
+        found = []
+        with self.lock:
+            for owner in owners:
+                for day in sorted(weekdays(entry)):
+                    tree = self.trees.get((*owner, day))
+                    if tree is None:
+                        continue
+                    for _, _, key in tree.overlapping(*span):
+                        other = self.entries[key]
+                        if key != own_key and clashes(entry, other, day):
+                            found.append((owner, day, other))
+        return found
+
+    def report(self, owner=None):
+        """Every pair of clashing entries, per owner, with the weekdays they
+        clash on."""
+        pairs = {}
+        with self.lock:
+            for (role, owner_id, day), tree in self.trees.items():
+                if owner is not None and (role, owner_id) != owner:
+                    continue
+                for start, end, key in tree:
+                    for _, _, other_key in tree.overlapping(start, end):
+                        if other_key <= key:
+                            continue
+                        a, b = self.entries[key], self.entries[other_key]
+                        if clashes(a, b, day):
+                            pairs.setdefault((role, owner_id, key, other_key), []).append(day)
+
+            return [
+                {
+                    "role": role,
+                    "owner_id": owner_id,
+                    "weekdays": sorted(days),
+                    "items": [describe(self.entries[key]), describe(self.entries[other_key])],
+                }
+                for (role, owner_id, key, other_key), days in sorted(pairs.items())
+            ]
+
+
+def event_owners(event):
+    return {(role, value) for role, value in (('student', event.student_id), ('teacher', event.teacher_id)) if value is not None}
+
+
+def build_index():
+    index = ScheduleIndex()
+    for role, table, column in (('student', course_student, 'student_id'), ('teacher', course_teacher, 'teacher_id')):
+        for owner_id, course_id in db.session.execute(select(table.c[column], table.c.course_id)):
+            index.course_owners.setdefault(course_id, set()).add((role, owner_id))
+
+    # plain rows, so edits pending in the session don't leak into the index
+    recurrence = ('id', 'daysOfWeek', 'startRecur', 'endRecur', 'startTime', 'endTime')
+    courses = select(*(getattr(Course, column) for column in (*recurrence, 'course_name')))
+    for course in db.session.execute(courses):
+        entry = entry_for(course, 'course')
+        if entry:
+            index.place(entry)
+
+    events = select(*(getattr(Event, column) for column in (*recurrence, 'title', 'allDay', 'start', 'end', 'course_id', 'student_id', 'teacher_id')))
+    for event in db.session.execute(events):
+        index.place(entry_for(event, 'event'), event_owners(event))
+    return index
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def schedule_index():
+    """The process wide schedule index, rebuilt every `SCHEDULE_INDEX_TTL`
+    seconds to pick up writes made by other processes."""
+    global _index
+    with _index_lock:
+        if _index is None or time.monotonic() - _index.built_at > app.config['SCHEDULE_INDEX_TTL']:
+            # pending changes in the session must not end up in the index
+            with db.session.no_autoflush:
+                _index = build_index()
+        return _index
+
+
+def find_conflicts(obj):
+    """Everything a pending event or course would clash with, as dicts for
+    a 409 response."""
+    entry = entry_for(obj)
+    if entry is None:
+        return []
+
+    index = schedule_index()
+    if isinstance(obj, Event):
+        owners = event_owners(obj)
+    else:
+        owners = index.owners_of(('course', obj.id))
+
+    return [
+        {"role": role, "owner_id": owner_id, "weekday": day, "with": describe(other)}
+        for (role, owner_id), day, other in index.conflicts(entry, owners)
+    ]
+
+
+def schedule_changes(obj):
+    """Changes to replay on the index once the transaction commits, in the
+    order they were flushed."""
+    state = inspect(obj)
+    changes = set()
+    if isinstance(obj, (Event, Course)):
+        key = ('event' if isinstance(obj, Event) else 'course', obj.id)
+        # after_flush still shows the pre-flush state, deletions included
+        if state.deleted or state.was_deleted or obj in state.session.deleted:
+            changes.add((next(_sequence), 'remove', key))
+        else:
+            entry = entry_for(obj)
+            owners = frozenset(event_owners(obj)) if isinstance(obj, Event) else None
+            changes.add((next(_sequence), 'place', key, entry, owners))
+
+    if isinstance(obj, (Student, Teacher)):
+        role = 'student' if isinstance(obj, Student) else 'teacher'
+        history = state.attrs.courses.history
+        changes.update((next(_sequence), 'enroll', (role, obj.id), course.id, True) for course in history.added)
+        changes.update((next(_sequence), 'enroll', (role, obj.id), course.id, False) for course in history.deleted)
+    elif isinstance(obj, Course):
+        for role, attribute in (('student', 'students'), ('teacher', 'teachers')):
+            history = state.attrs[attribute].history
+            changes.update((next(_sequence), 'enroll', (role, other.id), obj.id, True) for other in history.added)
+            changes.update((next(_sequence), 'enroll', (role, other.id), obj.id, False) for other in history.deleted)
+    return changes
+
+
+def apply_schedule_changes(changes):
+    index = _index
+    if index is None:
+        return
+    for change in sorted(changes, key=lambda change: change[0]):
+        if change[1] == 'remove':
+            index.remove(change[2])
+        elif change[1] == 'place':
+            _, _, key, entry, owners = change
+            if entry is None:
+                index.remove(key)
+            else:
+                index.place(entry, set(owners) if owners is not None else None)
+        else:
+            _, _, owner, course_id, enrolled = change
+            index.enroll(owner, course_id, enrolled)
+
+
+invalidate_on_commit('schedule', schedule_changes, apply_schedule_changes)
+
+register('schedule_index', lambda: {
+    "entries": len(_index.entries) if _index else 0,
+    "trees": len(_index.trees) if _index else 0,
+})
@@ -0,0 +1,79 @@
+import threading
+from sqlalchemy import inspect
+from config import app
+from cache import LRUCache, invalidate_on_commit
+from metrics import register
+from principal import role_of
+from links import links_enabled
+from models import Student, Teacher, Parent, Course
+
+
+dashboard_cache = LRUCache(
+    maxsize=app.config['DASHBOARD_CACHE_SIZE'],
+    ttl=app.config['DASHBOARD_CACHE_TTL'],
+)
+register('dashboard_cache', dashboard_cache.stats)
+
+ENTITY_KINDS = {Student: 'student', Teacher: 'teacher', Parent: 'parent', Course: 'course'}
+FOREIGN_KEYS = {'student_id': 'student', 'teacher_id': 'teacher', 'parent_id': 'parent', 'course_id': 'course'}
+
+# entity key -> dashboard keys whose payload was built from that entity
+_dependents = {}
+_lock = threading.Lock()
+
+
+def dashboard_key(user):
+    # dashboards embed student links, which ?links=0 leaves out
+    role = role_of(user)
+    return (role, getattr(user, f'{role}_id'), links_enabled())
+
+
+def entity_key(obj):
+    kind = ENTITY_KINDS.get(type(obj))
+    return (kind, obj.id) if kind else None
+
+
+def store_dashboard(key, payload, sources):
+    """Cache `payload` under `key`, to be dropped when any object in
+    `sources` (students, teachers, parents, courses) is written."""
+    dashboard_cache.set(key, payload)
+    with _lock:
+        _dependents.setdefault(key, set()).add(key)
+        for obj in sources:
+            _dependents.setdefault(entity_key(obj), set()).add(key)
+
+
+def affected_entities(obj):
+    state = inspect(obj)
+    keys = set()
+    own = entity_key(obj)
+    if own:
+        keys.add(own)
+
+    for column, kind in FOREIGN_KEYS.items():
+        if column in state.attrs:
+            history = state.attrs[column].history
+            for value in (*history.sum(), state.dict.get(column)):
+                if value is not None:
+                    keys.add((kind, value))
+
+    # enrollments show up as collection changes on either side
+    for relationship in state.mapper.relationships:
+        history = state.attrs[relationship.key].history
+        for related in (*history.added, *history.deleted):
+            related_key = entity_key(related)
+            if related_key:
+                keys.add(related_key)
+    return keys
+
+
+def invalidate_dashboards(keys):
+    with _lock:
+        stale = set()
+        for key in keys:
+            stale.update(_dependents.pop(key, ()))
+    for key in stale:
+        dashboard_cache.pop(key)
+
+
+invalidate_on_commit('dashboard', affected_entities, invalidate_dashboards)
@@ -0,0 +1,140 @@
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from metrics import register, increment
+
+
+STICKY_COOKIE = 'db_primary'
+
+
+def read_only_url(uri):
+    """The SQLite URI opened read-only, or None for other databases."""
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    database = url.database if url.query.get('uri') else f'file:{url.database}'
+    return url.set(database=database).update_query_dict({"mode": "ro", "uri": "true"})
+
+
+def configure_database(app):
+    """Size the connection pools and add a read-only `read` bind on SQLite.
+    Call before `db.init_app`."""
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    options.setdefault('pool_size', app.config['DATABASE_POOL_SIZE'])
+    options.setdefault('max_overflow', app.config['DATABASE_MAX_OVERFLOW'])
+    options.setdefault('pool_timeout', app.config['DATABASE_POOL_TIMEOUT'])
+
+    url = read_only_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url is not None:
+        app.config.setdefault('SQLALCHEMY_BINDS', {})['read'] = {
+            "url": url.render_as_string(hide_password=False),
+            "pool_size": app.config['DATABASE_READ_POOL_SIZE'],
+            "max_overflow": app.config['DATABASE_MAX_OVERFLOW'],
+            "pool_timeout": app.config['DATABASE_POOL_TIMEOUT'],
+        }
+
+
+def sqlite_pragmas(app, read_only=False):
+    pragmas = [
+        f"busy_timeout = {app.config['SQLITE_BUSY_TIMEOUT_MS']}",
+        "synchronous = NORMAL",
+        f"mmap_size = {app.config['SQLITE_MMAP_SIZE']}",
+        f"cache_size = {app.config['SQLITE_CACHE_SIZE']}",
+        "temp_store = MEMORY",
+    ]
+    if read_only:
+        pragmas.append("query_only = ON")
+    else:
+        # WAL lets readers carry on while a writer commits; it sticks to the file
+        pragmas.insert(0, "journal_mode = WAL")
+    return pragmas
+
+
+def configure_engines(app, db):
+    """Run the tuning pragmas on every new SQLite connection. Call after
+    `db.init_app`."""
+    with app.app_context():
+        engines = db.engines
+
+    for key, engine in engines.items():
+        if engine.dialect.name != 'sqlite':
+            continue
+        pragmas = sqlite_pragmas(app, read_only=key == 'read')
+
+        @event.listens_for(engine, 'connect')
+        def set_pragmas(dbapi_connection, connection_record, pragmas=pragmas):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(f"PRAGMA {pragma}")
+            cursor.close()
+
+    register('database', lambda: {
+        "primary" if key is None else key: {
+            "size": engine.pool.size(),
+            "checked_out": engine.pool.checkedout(),
+            "checked_in": engine.pool.checkedin(),
+        }
+        for key, engine in engines.items()
+    })
+
+
+class RoutingSession(Session):
+    """Sends the reads of GET and HEAD requests to the `read` bind and
+    everything else to the primary.
+
+    Once a session has flushed, it reads from the primary until the
+    transaction ends, and a client that just wrote keeps reading from the
+    primary for `DATABASE_STICKY_SECONDS` so it sees its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+
+        route = self.route(clause)
+        increment(f'db_routing.{route}')
+        if route == 'read':
+            return self._db.engines['read']
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+    def route(self, clause):
+        if not has_request_context() or request.method not in ('GET', 'HEAD'):
+            return 'primary'
+        if 'read' not in self._db.engines or not current_app.config['DATABASE_READ_ROUTING']:
+            return 'primary'
+        if self._flushing or self.info.get('wrote') or getattr(clause, 'is_dml', False):
+            return 'primary'
+        if request.cookies.get(STICKY_COOKIE):
+            return 'sticky'
+        return 'read'
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def mark_written(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def mark_committed(session):
+    if session.info.pop('wrote', False) and has_request_context():
+        g.db_wrote = True
+
+
+@event.listens_for(RoutingSession, 'after_soft_rollback')
+def mark_rolled_back(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop('wrote', None)
+
+
+def configure_routing(app):
+    @app.after_request
+    def stick_to_primary(response):
+        if g.get('db_wrote') and app.config['DATABASE_STICKY_SECONDS']:
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=app.config['DATABASE_STICKY_SECONDS'],
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,228 @@
+import math
+from sqlalchemy import event, inspect, select, update, delete, func, case, and_, literal
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+from config import db
+from models import Report_Card, Submitted_Assignment, Grade_Aggregate
+
+
+SOURCES = {Report_Card: 'report_card', Submitted_Assignment: 'submission'}
+MODELS = {source: model for model, source in SOURCES.items()}
+BUCKETS = 10
+aggregates = Grade_Aggregate.__table__
+
+
+def bucket(grade):
+    return min(max(grade // 10, 0), BUCKETS - 1)
+
+
+def scopes(student_id, course_id):
+    """Aggregates a grade counts towards: the student, the course and the
+    student in the course."""
+    return {(student_id, course_id), (student_id, 0), (0, course_id)} - {(0, 0)}
+
+
+def graded(model):
+    condition = model.grade.isnot(None)
+    if model is Submitted_Assignment:
+        condition = and_(condition, model.is_graded.is_(True))
+    return condition
+
+
+def contribution(obj, value):
+    """(source, student_id, course_id, grade) that `obj` adds to the
+    aggregates when its attributes are read through `value`, or None."""
+    grade = value('grade')
+    if grade is None or (isinstance(obj, Submitted_Assignment) and not value('is_graded')):
+        return None
+    return (SOURCES[type(obj)], value('student_id') or 0, value('course_id') or 0, int(grade))
+
+
+def committed_value(state, attribute):
+    history = state.attrs[attribute].history
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else None
+
+
+def grade_changes(session):
+    """Per aggregate deltas for every grade added, changed or removed in
+    this flush, and the aggregates that lost a grade."""
+    deltas, shrunk = {}, set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if type(obj) not in SOURCES:
+            continue
+        state = inspect(obj)
+        old = None if obj in session.new else contribution(obj, lambda attribute: committed_value(state, attribute))
+        new = None if obj in session.deleted else contribution(obj, lambda attribute: state.dict.get(attribute))
+        if old == new:
+            continue
+
+        for change, sign in ((old, -1), (new, 1)):
+            if change is None:
+                continue
+            source, student_id, course_id, grade = change
+            for scope in scopes(student_id, course_id):
+                key = (source, *scope)
+                delta = deltas.setdefault(key, {"count": 0, "total": 0, "total_squares": 0, "grades": [], "buckets": [0] * BUCKETS})
+                delta["count"] += sign
+                delta["total"] += sign * grade
+                delta["total_squares"] += sign * grade * grade
+                delta["buckets"][bucket(grade)] += sign
+                if sign > 0:
+                    delta["grades"].append(grade)
+                else:
+                    shrunk.add(key)
+    return deltas, shrunk
+
+
+def upsert(connection, key, delta):
+    source, student_id, course_id = key
+    grades = delta["grades"]
+    values = dict(
+        source=source, student_id=student_id, course_id=course_id,
+        count=delta["count"], total=delta["total"], total_squares=delta["total_squares"],
+        min_grade=min(grades) if grades else None,
+        max_grade=max(grades) if grades else None,
+        **{f'bucket_{n}': count for n, count in enumerate(delta["buckets"])},
+    )
+    statement = insert(aggregates).values(**values)
+    added = statement.excluded
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=['source', 'student_id', 'course_id'],
+        set_={
+            "count": aggregates.c.count + added.count,
+            "total": aggregates.c.total + added.total,
+            "total_squares": aggregates.c.total_squares + added.total_squares,
+            # two argument min() and max() are scalar in SQLite
+            "min_grade": func.min(func.coalesce(aggregates.c.min_grade, added.min_grade), func.coalesce(added.min_grade, aggregates.c.min_grade)),
+            "max_grade": func.max(func.coalesce(aggregates.c.max_grade, added.max_grade), func.coalesce(added.max_grade, aggregates.c.max_grade)),
+            "updated_at": func.now(),
+            **{f'bucket_{n}': aggregates.c[f'bucket_{n}'] + added[f'bucket_{n}'] for n in range(BUCKETS)},
+        },
+    ))
+
+
+def scope_filter(model, student_id, course_id):
+    condition = graded(model)
+    if student_id:
+        condition = and_(condition, model.student_id == student_id)
+    if course_id:
+        condition = and_(condition, model.course_id == course_id)
+    return condition
+
+
+def recompute_extremes(connection, key):
+    # the lost grade may have been the min or max, which can't be undone incrementally
+    source, student_id, course_id = key
+    model = MODELS[source]
+    condition = scope_filter(model, student_id, course_id)
+    connection.execute(
+        update(aggregates)
+        .where(aggregates.c.source == source, aggregates.c.student_id == student_id, aggregates.c.course_id == course_id)
+        .values(
+            min_grade=select(func.min(model.grade)).where(condition).scalar_subquery(),
+            max_grade=select(func.max(model.grade)).where(condition).scalar_subquery(),
+        )
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def update_gradebook(session, flush_context):
+    deltas, shrunk = grade_changes(session)
+    if not deltas:
+        return
+    connection = session.connection()
+    for key, delta in deltas.items():
+        upsert(connection, key, delta)
+    for key in shrunk:
+        recompute_extremes(connection, key)
+
+
+def rebuild_gradebook():
+    """Recompute every aggregate from the grades, for existing data or
+    after grades were changed behind the ORM's back."""
+    db.session.execute(delete(Grade_Aggregate))
+    for source, model in MODELS.items():
+        buckets = [
+            func.sum(case((and_(model.grade >= n * 10, model.grade < (n + 1) * 10) if 0 < n < BUCKETS - 1
+                           else (model.grade < 10 if n == 0 else model.grade >= n * 10), 1), else_=0)).label(f'bucket_{n}')
+            for n in range(BUCKETS)
+        ]
+        has_student, has_course = model.student_id.isnot(None), model.course_id.isnot(None)
+        for student_id, course_id, scope in (
+            (model.student_id, model.course_id, and_(has_student, has_course)),
+            (model.student_id, literal(0), has_student),
+            (literal(0), model.course_id, has_course),
+        ):
+            rows = db.session.execute(
+                select(
+                    student_id.label('student_id'), course_id.label('course_id'),
+                    func.count().label('count'), func.sum(model.grade).label('total'),
+                    func.sum(model.grade * model.grade).label('total_squares'),
+                    func.min(model.grade).label('min_grade'), func.max(model.grade).label('max_grade'),
+                    *buckets,
+                )
+                .where(graded(model), scope)
+                .group_by(student_id, course_id)
+            ).mappings().all()
+            rows = [dict(row, source=source) for row in rows]
+            if rows:
+                db.session.execute(insert(aggregates), rows)
+    db.session.commit()
+
+
+def stats(aggregate):
+    if aggregate is None or not aggregate.count:
+        return None
+    mean = aggregate.total / aggregate.count
+    variance = max(aggregate.total_squares / aggregate.count - mean * mean, 0.0)
+    return {
+        "count": aggregate.count,
+        "mean": round(mean, 2),
+        "stddev": round(math.sqrt(variance), 2),
+        "min": aggregate.min_grade,
+        "max": aggregate.max_grade,
+        "histogram": {
+            f"{n * 10}-{n * 10 + 9 if n < BUCKETS - 1 else 100}": getattr(aggregate, f'bucket_{n}')
+            for n in range(BUCKETS)
+        },
+    }
+
+
+def rank(aggregate):
+    """Position of a student's mean among the students with grades in the
+    same course, or school wide for a student's overall aggregate."""
+    peers = (
+        Grade_Aggregate.source == aggregate.source,
+        Grade_Aggregate.course_id == aggregate.course_id,
+        Grade_Aggregate.student_id != 0,
+        Grade_Aggregate.count > 0,
+    )
+    mean = Grade_Aggregate.total * 1.0 / Grade_Aggregate.count
+    ahead, total = db.session.execute(
+        select(
+            func.sum(case((mean > aggregate.total / aggregate.count, 1), else_=0)),
+            func.count(),
+        ).where(*peers)
+    ).one()
+    return {"rank": (ahead or 0) + 1, "of": total}
+
+
+def gradebook(student_id=0, course_id=0):
+    rows = db.session.scalars(
+        select(Grade_Aggregate).where(
+            Grade_Aggregate.source.in_(MODELS),
+            Grade_Aggregate.student_id == student_id,
+            Grade_Aggregate.course_id == course_id,
+        )
+    )
+    found = {row.source: row for row in rows}
+
+    payload = {"student_id": student_id or None, "course_id": course_id or None}
+    for source, name in (('report_card', 'report_cards'), ('submission', 'submissions')):
+        summary = stats(found.get(source))
+        if summary and student_id:
+            summary.update(rank(found[source]))
+        payload[name] = summary
+    return payload
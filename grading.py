@@ -0,0 +1,64 @@
+from sqlalchemy import select, tuple_
+from werkzeug.exceptions import BadRequest, NotFound
+from config import db
+from models import Submitted_Assignment, course_teacher
+
+
+def grading_queue(teacher_id=None, course_id=None, after=None, limit=100):
+    """Ungraded submissions in the courses of `teacher_id` and/or
+    `course_id`, oldest first, starting after the submission with id
+    `after`. Filtering on `is_graded == False` keeps SQLite on the partial
+    index of ungraded submissions."""
+    query = Submitted_Assignment.query.filter(Submitted_Assignment.is_graded == False)
+    if teacher_id is not None:
+        courses = select(course_teacher.c.course_id).where(course_teacher.c.teacher_id == teacher_id)
+        query = query.filter(Submitted_Assignment.course_id.in_(courses))
+    if course_id is not None:
+        query = query.filter(Submitted_Assignment.course_id == course_id)
+
+    if after is not None:
+        # compare against the stored values of the cursor row, as SQLite
+        # keeps timestamps as text that a bound datetime wouldn't match
+        cursor = select(Submitted_Assignment.created_at, Submitted_Assignment.id).where(Submitted_Assignment.id == after)
+        query = query.filter(tuple_(Submitted_Assignment.created_at, Submitted_Assignment.id) > cursor.scalar_subquery())
+
+    rows = query.order_by(Submitted_Assignment.created_at, Submitted_Assignment.id).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
+
+
+def is_grade(value):
+    """Whether `value` is a grade the gradebook can count: an integer, and
+    not a bool, which JSON true and false would otherwise pass as."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def parse_grades(data):
+    """{id: {"grade": ..., "remarks": ...}} from a bulk grading body."""
+    items = data.get('grades') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise BadRequest("grades must be a non-empty list of {id, grade, remarks}")
+
+    grades = {}
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get('id'), int):
+            raise BadRequest("every grade needs an integer id")
+        if not is_grade(item.get('grade')):
+            raise BadRequest(f"grade for submission {item['id']} must be an integer")
+        grades[item['id']] = {key: item[key] for key in ('grade', 'remarks') if key in item}
+    return grades
+
+
+def grade_submissions(grades):
+    """Grade many submissions in one transaction, all or none. The
+    gradebook aggregates pick the grades up when the flush runs."""
+    submissions = Submitted_Assignment.query.filter(Submitted_Assignment.id.in_(grades)).all()
+    missing = set(grades) - {submission.id for submission in submissions}
+    if missing:
+        raise NotFound(f"No submissions with ids {', '.join(map(str, sorted(missing)))}")
+
+    for submission in submissions:
+        for attr, value in grades[submission.id].items():
+            setattr(submission, attr, value)
+        submission.is_graded = True
+    db.session.commit()
+    return sorted(submissions, key=lambda submission: submission.id)
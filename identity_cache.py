@@ -0,0 +1,139 @@
+import threading
+from types import MappingProxyType
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+from config import app, db
+from cache import LRUCache, invalidate_on_commit
+from metrics import register
+from models import Course, Teacher, User, Assignment
+
+
+CACHED_MODELS = (Course, Teacher, User, Assignment)
+
+# password hashes stay out of snapshots, and so out of reprs, logs and tracebacks
+SECRET_COLUMNS = {'_password'}
+
+# stands in for every row of a model, after a bulk update or delete
+ALL = object()
+
+_caches = {
+    model: LRUCache(maxsize=app.config['IDENTITY_CACHE_SIZE'], ttl=app.config['IDENTITY_CACHE_TTL'])
+    for model in CACHED_MODELS
+}
+_models_by_table = {model.__table__.name: model for model in CACHED_MODELS}
+
+# bumped on every invalidation, so a row read before a commit isn't cached after it
+_generation = 0
+_lock = threading.Lock()
+
+register('identity_cache', lambda: {model.__name__: cache.stats() for model, cache in _caches.items()})
+
+
+class Snapshot:
+    """Read-only copy of a row's columns, detached from any session so it
+    can be shared between threads."""
+
+    __slots__ = ('_model', '_values')
+
+    def __init__(self, model, values):
+        object.__setattr__(self, '_model', model)
+        object.__setattr__(self, '_values', MappingProxyType(values))
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(f"{self._model.__name__} snapshot has no attribute {name!r}") from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self._model.__name__} snapshots are read-only")
+
+    def __repr__(self):
+        return f'<{self._model.__name__} snapshot {dict(self._values)!r}>'
+
+
+def snapshot(obj):
+    model = type(obj)
+    return Snapshot(model, {
+        attr.key: getattr(obj, attr.key) for attr in inspect(model).column_attrs if attr.key not in SECRET_COLUMNS
+    })
+
+
+def primary_key(model, pk):
+    """`pk` as the type of the model's primary key column, the way the
+    cache is invalidated, or None when it can't be one."""
+    try:
+        return model.__mapper__.primary_key[0].type.python_type(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+def written_rows(obj):
+    model = type(obj)
+    if model not in _caches:
+        return set()
+    state = inspect(obj)
+    keys = {(model, state.identity[0])} if state.identity else set()
+    # a changed primary key leaves the old one behind
+    for column in state.mapper.primary_key:
+        attr = state.mapper.get_property_by_column(column).key
+        keys.update((model, value) for value in state.attrs[attr].history.deleted)
+    return keys
+
+
+def invalidate_rows(keys):
+    global _generation
+    with _lock:
+        _generation += 1
+    for model, pk in keys:
+        if pk is ALL:
+            _caches[model].clear()
+        else:
+            _caches[model].pop(pk)
+
+
+invalidate_on_commit('identity_cache', written_rows, invalidate_rows)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def collect_bulk_writes(orm_execute_state):
+    # bulk updates and deletes skip the flush; inserts can't make a cached row stale
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        model = _models_by_table.get(getattr(orm_execute_state.statement.table, 'name', None))
+        if model is not None:
+            orm_execute_state.session.info.setdefault('identity_cache', set()).add((model, ALL))
+
+
+def cached_get(model, pk):
+    """A Snapshot of the `model` row with primary key `pk`, or None. Rows
+    come from the process-wide cache unless this session holds the row or
+    has written it in the current transaction."""
+    # ids straight from a request body can be strings
+    pk = primary_key(model, pk) if pk is not None else None
+    if pk is None:
+        return None
+
+    session = db.session()
+    obj = session.identity_map.get(identity_key(model, pk))
+    if obj is not None:
+        return snapshot(obj)
+    written = session.info.get('identity_cache', ())
+    if (model, pk) in written or (model, ALL) in written:
+        obj = session.get(model, pk)
+        return snapshot(obj) if obj is not None else None
+
+    cache = _caches[model]
+    found = cache.get(pk)
+    if found is not None:
+        return found
+
+    generation = _generation
+    obj = session.get(model, pk)
+    if obj is None:
+        return None
+    found = snapshot(obj)
+    with _lock:
+        if generation == _generation:
+            cache.set(pk, found)
+    return found
@@ -0,0 +1,137 @@
+import itertools
+import random
+
+
+class _Node:
+    __slots__ = ('key', 'start', 'end', 'value', 'priority', 'max_end', 'left', 'right')
+
+    def __init__(self, key, start, end, value):
+        self.key = key
+        self.start = start
+        self.end = end
+        self.value = value
+        self.priority = random.random()
+        self.max_end = end
+        self.left = None
+        self.right = None
+
+
+def _update(node):
+    node.max_end = node.end
+    for child in (node.left, node.right):
+        if child is not None and child.max_end > node.max_end:
+            node.max_end = child.max_end
+    return node
+
+
+def _split(node, key):
+    # (keys below `key`, keys from `key` up)
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        return _update(node), right
+    left, node.left = _split(node.left, key)
+    return left, _update(node)
+
+
+def _merge(left, right):
+    if left is None or right is None:
+        return left or right
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _update(left)
+    right.left = _merge(left, right.left)
+    return _update(right)
+
+
+def _remove(node, key):
+    if node is None:
+        return None
+    if key == node.key:
+        return _merge(node.left, node.right)
+    if key < node.key:
+        node.left = _remove(node.left, key)
+    else:
+        node.right = _remove(node.right, key)
+    return _update(node)
+
+
+class IntervalTree:
+    """Closed intervals `[start, end]` carrying hashable values.
+
+    A treap ordered by start and augmented with the largest end in each
+    subtree, so inserts, removals and overlap checks take O(log n) expected
+    time, plus the number of intervals reported. A value can only be in the
+    tree once; inserting it again moves it.
+    """
+
+    def __init__(self, intervals=()):
+        self._root = None
+        self._keys = {}
+        self._counter = itertools.count()
+        for start, end, value in intervals:
+            self.insert(start, end, value)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, value):
+        return value in self._keys
+
+    def __iter__(self):
+        stack, node = [], self._root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.start, node.end, node.value
+            node = node.right
+
+    def insert(self, start, end, value):
+        self.remove(value)
+        key = (start, end, next(self._counter))
+        left, right = _split(self._root, key)
+        self._root = _merge(_merge(left, _Node(key, start, end, value)), right)
+        self._keys[value] = key
+
+    def remove(self, value):
+        key = self._keys.pop(value, None)
+        if key is None:
+            return False
+        self._root = _remove(self._root, key)
+        return True
+
+    def overlapping(self, start, end):
+        """(start, end, value) of every interval overlapping `[start, end]`,
+        in order of start."""
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            # nothing below ends late enough to reach the query
+            if node is None or node.max_end < start:
+                continue
+            if node.start <= end:
+                # right subtree starts later, only visit it while it can still overlap
+                stack.append(node.right)
+                if node.end >= start:
+                    found.append((node.start, node.end, node.value))
+            stack.append(node.left)
+        found.sort(key=lambda interval: interval[0])
+        return found
+
+    def overlaps(self, start, end):
+        node = self._root
+        while node is not None:
+            if node.start <= end and node.end >= start:
+                return True
+            # the left subtree holds the earliest starts, so it overlaps if anything there ends late enough
+            if node.left is not None and node.left.max_end >= start:
+                node = node.left
+            elif node.start <= end:
+                node = node.right
+            else:
+                return False
+        return False
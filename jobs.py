@@ -0,0 +1,165 @@
+import os
+import socket
+import threading
+import traceback
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, or_, and_
+from sqlalchemy.dialects.sqlite import insert
+from config import app, db
+from metrics import register, increment
+from models import Job
+
+
+handlers = {}
+
+_workers = []
+_workers_pid = None
+_workers_lock = threading.Lock()
+
+
+def job(kind):
+    """Register the decorated function as the handler for `kind` jobs. It
+    is called with the job payload as keyword arguments."""
+    def decorator(fn):
+        handlers[kind] = fn
+        return fn
+    return decorator
+
+
+def enqueue(kind, payload, key=None, delay=0):
+    """Add a job to the current transaction, so it only becomes visible to
+    workers once the caller commits. Jobs sharing an idempotency `key` are
+    only queued once and the existing job is returned instead."""
+    values = dict(
+        kind=kind,
+        payload=payload,
+        status='queued',
+        attempts=0,
+        max_attempts=app.config['JOB_MAX_ATTEMPTS'],
+        idempotency_key=key,
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    if key is None:
+        new_job = Job(**values)
+        db.session.add(new_job)
+        db.session.flush()
+        return new_job
+
+    db.session.execute(insert(Job).values(**values).on_conflict_do_nothing())
+    return db.session.scalars(select(Job).filter_by(idempotency_key=key)).one()
+
+
+def claim(worker_id):
+    """Lock the next due job for `worker_id`, or return None. Running jobs
+    whose lease has expired are picked up again, unless that was their last
+    attempt, as a job that kills or hangs its worker never reaches run()."""
+    now = datetime.utcnow()
+    expired = now - timedelta(seconds=app.config['JOB_LEASE_SECONDS'])
+    abandoned = and_(Job.status == 'running', Job.locked_at < expired)
+
+    failed = db.session.execute(
+        update(Job)
+        .where(abandoned, Job.attempts >= Job.max_attempts)
+        .values(status='failed', last_error='Lease expired on the last attempt', locked_by=None, locked_at=None)
+    ).rowcount
+    if failed:
+        db.session.commit()
+        increment('jobs.failed', failed)
+
+    claimable = or_(
+        and_(Job.status == 'queued', Job.run_at <= now),
+        and_(abandoned, Job.attempts < Job.max_attempts),
+    )
+
+    while True:
+        candidate = db.session.scalars(
+            select(Job.id).where(claimable).order_by(Job.run_at, Job.id).limit(1)
+        ).first()
+        if candidate is None:
+            db.session.rollback()
+            return None
+
+        # only one worker wins the conditional update
+        claimed = db.session.execute(
+            update(Job)
+            .where(Job.id == candidate, claimable)
+            .values(status='running', locked_by=worker_id, locked_at=now, attempts=Job.attempts + 1)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, candidate)
+
+
+def run(claimed):
+    try:
+        result = handlers[claimed.kind](**claimed.payload)
+    except Exception:
+        db.session.rollback()
+        claimed = db.session.get(Job, claimed.id)
+        claimed.last_error = traceback.format_exc(limit=5)
+        if claimed.attempts >= claimed.max_attempts:
+            claimed.status = 'failed'
+            increment('jobs.failed')
+        else:
+            backoff = app.config['JOB_BACKOFF_SECONDS'] * 2 ** (claimed.attempts - 1)
+            claimed.status = 'queued'
+            claimed.run_at = datetime.utcnow() + timedelta(seconds=backoff)
+            increment('jobs.retried')
+    else:
+        claimed.status = 'done'
+        claimed.result = result
+        increment('jobs.done')
+
+    claimed.locked_by = None
+    claimed.locked_at = None
+    db.session.commit()
+
+
+def work_once(worker_id):
+    with app.app_context():
+        claimed = claim(worker_id)
+        if claimed is None:
+            return False
+        run(claimed)
+        return True
+
+
+def work(worker_id, stop):
+    while not stop.is_set():
+        try:
+            busy = work_once(worker_id)
+        except Exception:
+            app.logger.exception("Job worker %s failed", worker_id)
+            busy = False
+        if not busy:
+            stop.wait(app.config['JOB_POLL_INTERVAL'])
+
+
+def start_workers(count, stop=None):
+    stop = stop or threading.Event()
+    threads = []
+    for n in range(count):
+        worker_id = f'{socket.gethostname()}:{os.getpid()}:{n}'
+        thread = threading.Thread(target=work, args=(worker_id, stop), name=f'job-worker-{n}', daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+def ensure_workers():
+    """Start the in-process worker threads once per process."""
+    global _workers, _workers_pid
+    if _workers_pid == os.getpid():
+        return
+    with _workers_lock:
+        if _workers_pid != os.getpid():
+            _workers = start_workers(app.config['JOB_WORKER_THREADS'])
+            _workers_pid = os.getpid()
+
+
+def queue_stats():
+    rows = db.session.execute(select(Job.status, db.func.count()).group_by(Job.status)).all()
+    return dict(rows)
+
+
+register('jobs', lambda: {"workers": len(_workers), **queue_stats()})
@@ -0,0 +1,100 @@
+import re
+import threading
+from flask import g, request, url_for, has_request_context
+from marshmallow import fields, missing
+
+
+# numbers standing in for the arguments while a template is built; they
+# pass any converter and won't appear in a route by accident
+MARKER = 8765432100
+placeholder_regex = re.compile(r'^<(\w+)>$')
+
+_templates = {}
+_lock = threading.Lock()
+
+
+def link_context():
+    """(links wanted, script root) for the current request, worked out once
+    per request since every dumped row asks."""
+    if not has_request_context():
+        return True, ''
+    context = g.get('links')
+    if context is None:
+        enabled = request.args.get('links', '1').lower() not in ('0', 'false', 'no')
+        context = g.links = (enabled, request.script_root)
+    return context
+
+
+def links_enabled():
+    return link_context()[0]
+
+
+def link_template(script_root, endpoint, arguments, constants):
+    """The URL of `endpoint` as a str.format template with a positional
+    field per argument, built with the routing system once per script root."""
+    key = (script_root, endpoint, arguments, constants)
+    template = _templates.get(key)
+    if template is None:
+        markers = {argument: MARKER + n for n, argument in enumerate(arguments)}
+        url = url_for(endpoint, **dict(constants), **markers)
+        template = url.replace('{', '{{').replace('}', '}}')
+        for n, argument in enumerate(arguments):
+            template = template.replace(str(markers[argument]), f'{{{n}}}')
+        with _lock:
+            _templates[key] = template
+    return template
+
+
+class Link:
+    """A link to `endpoint`, with `values` like URLFor's: '<attr>' takes
+    the argument from the object being dumped, anything else is fixed."""
+
+    def __init__(self, endpoint, **values):
+        self.endpoint = endpoint
+        self.arguments, self.attributes, constants = (), (), []
+        for argument, value in values.items():
+            match = placeholder_regex.match(value) if isinstance(value, str) else None
+            if match:
+                self.arguments += (argument,)
+                self.attributes += (match.group(1),)
+            else:
+                constants.append((argument, value))
+        self.constants = tuple(constants)
+
+    def build(self, obj, script_root):
+        values = [getattr(obj, attribute) for attribute in self.attributes]
+        # like URLFor, a missing id gives no URL
+        if None in values:
+            return None
+        return link_template(script_root, self.endpoint, self.arguments, self.constants).format(*values)
+
+
+class Links(fields.Field):
+    """A block of links formatted into templates instead of routed per
+    object. The block is left out under `?links=0`, and when the object's
+    `requires` attribute is None."""
+
+    _CHECK_ATTRIBUTE = False
+    # serializers.py has to expect the field to be left out
+    skippable = True
+
+    def __init__(self, links, requires=None, **kwargs):
+        kwargs.setdefault('dump_only', True)
+        super().__init__(**kwargs)
+        self.links = links
+        self.requires = requires
+
+    @property
+    def attributes(self):
+        """Attributes of the dumped object the block reads, to be loaded
+        along with the fields when a query is restricted to them."""
+        attributes = {attribute for link in self.links.values() for attribute in link.attributes}
+        if self.requires:
+            attributes.add(self.requires)
+        return attributes
+
+    def _serialize(self, value, attr, obj, **kwargs):
+        enabled, script_root = link_context()
+        if not enabled or (self.requires and getattr(obj, self.requires) is None):
+            return missing
+        return {name: link.build(obj, script_root) for name, link in self.links.items()}
@@ -0,0 +1,55 @@
+from weakref import WeakKeyDictionary
+from marshmallow import fields
+from sqlalchemy.orm import selectinload, joinedload
+
+
+_plans = WeakKeyDictionary()
+
+
+def nested_schema(field):
+    if isinstance(field, fields.List):
+        field = field.inner
+    if isinstance(field, fields.Nested):
+        return field.schema
+    return None
+
+
+def build_plan(schema, model):
+    # collections are fetched with one SELECT ... IN per level, scalar
+    # relationships are joined onto the parent query
+    options = []
+    relationships = model.__mapper__.relationships
+
+    for name, field in schema.dump_fields.items():
+        attr = field.attribute or name
+        if attr not in relationships:
+            continue
+
+        relationship = relationships[attr]
+        strategy = selectinload if relationship.uselist else joinedload
+        loader = strategy(getattr(model, attr))
+
+        nested = nested_schema(field)
+        if nested is not None:
+            children = build_plan(nested, relationship.mapper.class_)
+            if children:
+                loader = loader.options(*children)
+        options.append(loader)
+
+    return options
+
+
+def loader_options(schema):
+    """Eager loading options covering every relationship `schema` dumps,
+    including nested schemas and their `only=` restrictions."""
+    if schema not in _plans:
+        _plans[schema] = build_plan(schema, schema.opts.model)
+    return _plans[schema]
+
+
+def eager(query, schema):
+    return query.options(*loader_options(schema))
+
+
+def load_with(attribute, schema):
+    return selectinload(attribute).options(*loader_options(schema))
@@ -0,0 +1,45 @@
+import threading
+from collections import defaultdict
+
+
+_collectors = {}
+_counters = defaultdict(int)
+_lock = threading.Lock()
+
+
+class TimingStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def stats(self):
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+def register(name, collector):
+    """Expose the dict returned by `collector()` under `name` at /metrics."""
+    _collectors[name] = collector
+
+
+def increment(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+
+def snapshot():
+    data = {name: collector() for name, collector in _collectors.items()}
+    with _lock:
+        data['counters'] = dict(_counters)
+    return data
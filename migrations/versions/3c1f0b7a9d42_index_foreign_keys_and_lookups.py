@@ -0,0 +1,78 @@
+"""Index foreign keys, the course side of the association tables and date lookups
+
+Revision ID: 3c1f0b7a9d42
+Revises: 33c77a959c24
+Create Date: 2026-10-18 07:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f0b7a9d42'
+down_revision = '33c77a959c24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_assignments_course_id'), 'assignments', ['course_id'], unique=False)
+    op.create_index(op.f('ix_assignments_due_date'), 'assignments', ['due_date'], unique=False)
+    op.create_index(op.f('ix_assignments_teacher_id'), 'assignments', ['teacher_id'], unique=False)
+    op.create_index(op.f('ix_comments_parent_id'), 'comments', ['parent_id'], unique=False)
+    op.create_index(op.f('ix_comments_student_id'), 'comments', ['student_id'], unique=False)
+    op.create_index(op.f('ix_comments_teacher_id'), 'comments', ['teacher_id'], unique=False)
+    op.create_index(op.f('ix_contents_course_id'), 'contents', ['course_id'], unique=False)
+    op.create_index(op.f('ix_contents_student_id'), 'contents', ['student_id'], unique=False)
+    op.create_index(op.f('ix_contents_teacher_id'), 'contents', ['teacher_id'], unique=False)
+    op.create_index(op.f('ix_course_student_course_id_student_id'), 'course_student', ['course_id', 'student_id'], unique=False)
+    op.create_index(op.f('ix_course_teacher_course_id_teacher_id'), 'course_teacher', ['course_id', 'teacher_id'], unique=False)
+    op.create_index(op.f('ix_events_course_id'), 'events', ['course_id'], unique=False)
+    op.create_index(op.f('ix_events_start'), 'events', ['start'], unique=False)
+    op.create_index(op.f('ix_events_startRecur'), 'events', ['startRecur'], unique=False)
+    op.create_index(op.f('ix_events_student_id'), 'events', ['student_id'], unique=False)
+    op.create_index(op.f('ix_events_teacher_id'), 'events', ['teacher_id'], unique=False)
+    op.create_index(op.f('ix_report_cards_course_id'), 'report_cards', ['course_id'], unique=False)
+    op.create_index(op.f('ix_report_cards_student_id'), 'report_cards', ['student_id'], unique=False)
+    op.create_index(op.f('ix_report_cards_teacher_id'), 'report_cards', ['teacher_id'], unique=False)
+    op.create_index(op.f('ix_saved-contents_course_id'), 'saved-contents', ['course_id'], unique=False)
+    op.create_index(op.f('ix_saved-contents_student_id'), 'saved-contents', ['student_id'], unique=False)
+    op.create_index(op.f('ix_saved-contents_teacher_id'), 'saved-contents', ['teacher_id'], unique=False)
+    op.create_index(op.f('ix_students_parent_id'), 'students', ['parent_id'], unique=False)
+    op.create_index(op.f('ix_submitted_assignments_course_id'), 'submitted_assignments', ['course_id'], unique=False)
+    op.create_index(op.f('ix_submitted_assignments_student_id'), 'submitted_assignments', ['student_id'], unique=False)
+    op.create_index(op.f('ix_users_parent_id'), 'users', ['parent_id'], unique=False)
+    op.create_index(op.f('ix_users_student_id'), 'users', ['student_id'], unique=False)
+    op.create_index(op.f('ix_users_teacher_id'), 'users', ['teacher_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_users_teacher_id'), table_name='users')
+    op.drop_index(op.f('ix_users_student_id'), table_name='users')
+    op.drop_index(op.f('ix_users_parent_id'), table_name='users')
+    op.drop_index(op.f('ix_submitted_assignments_student_id'), table_name='submitted_assignments')
+    op.drop_index(op.f('ix_submitted_assignments_course_id'), table_name='submitted_assignments')
+    op.drop_index(op.f('ix_students_parent_id'), table_name='students')
+    op.drop_index(op.f('ix_saved-contents_teacher_id'), table_name='saved-contents')
+    op.drop_index(op.f('ix_saved-contents_student_id'), table_name='saved-contents')
+    op.drop_index(op.f('ix_saved-contents_course_id'), table_name='saved-contents')
+    op.drop_index(op.f('ix_report_cards_teacher_id'), table_name='report_cards')
+    op.drop_index(op.f('ix_report_cards_student_id'), table_name='report_cards')
+    op.drop_index(op.f('ix_report_cards_course_id'), table_name='report_cards')
+    op.drop_index(op.f('ix_events_teacher_id'), table_name='events')
+    op.drop_index(op.f('ix_events_student_id'), table_name='events')
+    op.drop_index(op.f('ix_events_startRecur'), table_name='events')
+    op.drop_index(op.f('ix_events_start'), table_name='events')
+    op.drop_index(op.f('ix_events_course_id'), table_name='events')
+    op.drop_index(op.f('ix_course_teacher_course_id_teacher_id'), table_name='course_teacher')
+    op.drop_index(op.f('ix_course_student_course_id_student_id'), table_name='course_student')
+    op.drop_index(op.f('ix_contents_teacher_id'), table_name='contents')
+    op.drop_index(op.f('ix_contents_student_id'), table_name='contents')
+    op.drop_index(op.f('ix_contents_course_id'), table_name='contents')
+    op.drop_index(op.f('ix_comments_teacher_id'), table_name='comments')
+    op.drop_index(op.f('ix_comments_student_id'), table_name='comments')
+    op.drop_index(op.f('ix_comments_parent_id'), table_name='comments')
+    op.drop_index(op.f('ix_assignments_teacher_id'), table_name='assignments')
+    op.drop_index(op.f('ix_assignments_due_date'), table_name='assignments')
+    op.drop_index(op.f('ix_assignments_course_id'), table_name='assignments')
@@ -0,0 +1,71 @@
+"""Add grade_aggregates for the gradebook
+
+Revision ID: b5e2d1c07f3a
+Revises: 3c1f0b7a9d42
+Create Date: 2026-10-18 08:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e2d1c07f3a'
+down_revision = '3c1f0b7a9d42'
+branch_labels = None
+depends_on = None
+
+
+# the grades each source counts, as gradebook.graded() selects them
+SOURCES = {
+    'report_card': ('report_cards', 'grade IS NOT NULL'),
+    'submission': ('submitted_assignments', 'grade IS NOT NULL AND is_graded = 1'),
+}
+# (student_id, course_id, rows) of the student in the course, the student and the course aggregates
+SCOPES = (
+    ('student_id', 'course_id', 'student_id IS NOT NULL AND course_id IS NOT NULL'),
+    ('student_id', '0', 'student_id IS NOT NULL'),
+    ('0', 'course_id', 'course_id IS NOT NULL'),
+)
+
+
+def upgrade():
+    op.create_table('grade_aggregates',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('total_squares', sa.Integer(), nullable=False),
+    sa.Column('min_grade', sa.Integer(), nullable=True),
+    sa.Column('max_grade', sa.Integer(), nullable=True),
+    *[sa.Column(f'bucket_{n}', sa.Integer(), nullable=False) for n in range(10)],
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('source', 'student_id', 'course_id', name='uq_grade_aggregates_scope')
+    )
+    op.create_index('ix_grade_aggregates_course', 'grade_aggregates', ['source', 'course_id', 'student_id'], unique=False)
+
+    # aggregate the grades already in the database, which the gradebook
+    # would otherwise only count from their next change on
+    buckets = ', '.join(f'bucket_{n}' for n in range(10))
+    bucket_sums = ', '.join(
+        f'sum(CASE WHEN grade >= {n * 10} AND grade < {(n + 1) * 10} THEN 1 ELSE 0 END)' if 0 < n < 9
+        else ('sum(CASE WHEN grade < 10 THEN 1 ELSE 0 END)' if n == 0 else 'sum(CASE WHEN grade >= 90 THEN 1 ELSE 0 END)')
+        for n in range(10)
+    )
+    for source, (table, graded) in SOURCES.items():
+        for student_id, course_id, scope in SCOPES:
+            # a literal 0 in GROUP BY would be read as a column number
+            group_by = ', '.join(column for column in (student_id, course_id) if column != '0')
+            op.execute(
+                f"INSERT INTO grade_aggregates (source, student_id, course_id, count, total, total_squares, min_grade, max_grade, {buckets}) "
+                f"SELECT '{source}', {student_id}, {course_id}, count(*), sum(grade), sum(grade * grade), min(grade), max(grade), {bucket_sums} "
+                f"FROM {table} WHERE {graded} AND {scope} GROUP BY {group_by}"
+            )
+
+
+def downgrade():
+    op.drop_index('ix_grade_aggregates_course', table_name='grade_aggregates')
+    op.drop_table('grade_aggregates')
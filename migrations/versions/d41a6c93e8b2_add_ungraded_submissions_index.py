@@ -0,0 +1,26 @@
+"""Add a partial index on ungraded submissions for the grading queue
+
+Revision ID: d41a6c93e8b2
+Revises: b5e2d1c07f3a
+Create Date: 2026-10-18 09:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd41a6c93e8b2'
+down_revision = 'b5e2d1c07f3a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # submissions saved without a value are ungraded, and have to say so to be in the index
+    op.execute("UPDATE submitted_assignments SET is_graded = 0 WHERE is_graded IS NULL")
+    op.create_index('ix_submitted_assignments_ungraded', 'submitted_assignments', ['course_id', 'created_at', 'id'], unique=False, sqlite_where=sa.text('is_graded = 0'))
+
+
+def downgrade():
+    op.drop_index('ix_submitted_assignments_ungraded', table_name='submitted_assignments')
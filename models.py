@@ -1,4 +1,5 @@
 from config import db, bcrypt
+from passwords import verify_password, hash_password, needs_rehash, PoolSaturated
 from sqlalchemy.orm import validates
 from sqlalchemy.ext.hybrid import hybrid_property
 import re
@@ -8,6 +9,8 @@ course_teacher = db.Table(
     db.metadata,
     db.Column('teacher_id', db.ForeignKey('teachers.id'), primary_key=True),
     db.Column('course_id', db.ForeignKey('courses.id'), primary_key=True),
+    # the primary key covers teacher_id lookups, this covers the course side
+    db.Index('ix_course_teacher_course_id_teacher_id', 'course_id', 'teacher_id'),
     extend_existing =True
 )
 
@@ -16,6 +19,8 @@ course_student = db.Table(
     db.metadata,
     db.Column('student_id', db.ForeignKey('students.id'), primary_key=True),
     db.Column('course_id', db.ForeignKey('courses.id'), primary_key=True),
+    # the primary key covers student_id lookups, this covers the course side
+    db.Index('ix_course_student_course_id_student_id', 'course_id', 'student_id'),
     extend_existing =True
 )
 
@@ -24,9 +29,9 @@ class User(db.Model):
 
     email = db.Column(db.String, nullable = False , unique = True, primary_key = True)
     _password = db.Column(db.String, nullable = False , unique = True)
-    parent_id = db.Column(db.Integer, db.ForeignKey('parents.id'))
-    student_id = db.Column(db.Integer, db.ForeignKey('students.id'))
-    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'))
+    parent_id = db.Column(db.Integer, db.ForeignKey('parents.id'), index=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), index=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'), index=True)
     
     
     @hybrid_property
@@ -39,9 +44,22 @@ class User(db.Model):
         self._password = password_hash.decode('utf-8')
     
     def authenticate(self,pwd):
-        pwd_check = bcrypt.check_password_hash(self._password, pwd.encode('utf-8'))
+        pwd_check = verify_password(self._password, pwd)
         return pwd_check
 
+    def rehash(self,pwd):
+        if not needs_rehash(self._password):
+            return
+        try:
+            self._password = hash_password(pwd)
+        except PoolSaturated:
+            return
+
+        for account in (self.student, self.teacher, self.parent):
+            if account:
+                account._password = self._password
+        db.session.commit()
+
 class Student(db.Model):
     __tablename__ = 'students'
 
@@ -55,7 +73,7 @@ class Student(db.Model):
     created_at = db.Column(db.DateTime, server_default = db.func.now())
     updated_at = db.Column(db.DateTime, onupdate = db.func.now())
 
-    parent_id = db.Column(db.Integer, db.ForeignKey('parents.id'))
+    parent_id = db.Column(db.Integer, db.ForeignKey('parents.id'), index=True)
 
     user = db.relationship('User', backref='student', cascade="save-update , merge, delete, delete-orphan")
     event = db.relationship('Event', back_populates='student', cascade="save-update , merge, delete, delete-orphan")
@@ -100,7 +118,6 @@ class Student(db.Model):
             student_id = self.id
         )
         db.session.add(user)
-        db.session.commit()
         return user
     
 class Teacher(db.Model):
@@ -158,7 +175,6 @@ class Teacher(db.Model):
             teacher_id = self.id
         )
         db.session.add(user)
-        db.session.commit()
         return user
 
 class Parent(db.Model):
@@ -210,7 +226,6 @@ class Parent(db.Model):
             parent_id = self.id
         )
         db.session.add(user)
-        db.session.commit()
         return user
 
     
@@ -247,9 +262,9 @@ class Content(db.Model):
     created_at = db.Column(db.DateTime, server_default = db.func.now())
     updated_at = db.Column(db.DateTime, onupdate = db.func.now())
 
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'))
-    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'))
-    student_id = db.Column(db.Integer, db.ForeignKey('students.id'))
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), index=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'), index=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), index=True)
 
     course = db.relationship('Course', back_populates='content', cascade="save-update , merge, delete")
 
@@ -265,9 +280,9 @@ class Saved_Content(db.Model):
     created_at = db.Column(db.DateTime, server_default = db.func.now())
     updated_at = db.Column(db.DateTime, onupdate = db.func.now())
 
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'))
-    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'))
-    student_id = db.Column(db.Integer, db.ForeignKey('students.id'))
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), index=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'), index=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), index=True)
 
     def __repr__(self):
         return '<Saved_Content %r >' % (self.content_name)
@@ -282,9 +297,9 @@ class Report_Card(db.Model):
     created_at = db.Column(db.DateTime, server_default = db.func.now())
     updated_at = db.Column(db.DateTime, onupdate = db.func.now())
 
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'))
-    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'))
-    student_id = db.Column(db.Integer, db.ForeignKey('students.id'))
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), index=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'), index=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), index=True)
 
     student = db.relationship('Student', back_populates='report_card', cascade="save-update , merge, delete")
 
@@ -298,12 +313,12 @@ class Assignment(db.Model):
     topic = db.Column(db.String, nullable = False)
     content = db.Column(db.String, nullable = False)
     assignment_file = db.Column(db.String)
-    due_date = db.Column(db.DateTime, server_default = db.func.now())
+    due_date = db.Column(db.DateTime, server_default = db.func.now(), index=True)
     created_at = db.Column(db.DateTime, server_default = db.func.now())
     updated_at = db.Column(db.DateTime, onupdate = db.func.now())
 
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'))
-    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'))
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), index=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'), index=True)
 
     def __repr__(self):
         return '<Assignment %r >' % (self.assignment_name)
@@ -321,8 +336,13 @@ class Submitted_Assignment(db.Model):
     created_at = db.Column(db.DateTime, server_default = db.func.now())
     updated_at = db.Column(db.DateTime, onupdate = db.func.now())
 
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'))
-    student_id = db.Column(db.Integer, db.ForeignKey('students.id'))
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), index=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), index=True)
+
+    # only the ungraded submissions, in grading queue order
+    __table_args__ = (
+        db.Index('ix_submitted_assignments_ungraded', 'course_id', 'created_at', 'id', sqlite_where=db.text('is_graded = 0')),
+    )
     
     
 class Event(db.Model):
@@ -331,21 +351,21 @@ class Event(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     groupId = db.Column(db.Integer) 
     allDay = db.Column(db.Boolean, default=False)
-    start = db.Column(db.Date, nullable=False)
+    start = db.Column(db.Date, nullable=False, index=True)
     end = db.Column(db.Date)
     daysOfWeek = db.Column(db.String)  
     startTime = db.Column(db.Time) 
     endTime = db.Column(db.Time)  
-    startRecur = db.Column(db.Date)
+    startRecur = db.Column(db.Date, index=True)
     endRecur = db.Column(db.Date)
     title = db.Column(db.String, nullable=False)
     
     def __repr__(self):
         return '<Event %r >' % (self.title)
     
-    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'))
-    student_id = db.Column(db.Integer, db.ForeignKey('students.id'))
-    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'))
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), index=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), index=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'), index=True)
     
     student = db.relationship('Student', back_populates='event', cascade="save-update , merge, delete")
     teacher = db.relationship('Teacher', back_populates='event', cascade="save-update , merge, delete")
@@ -361,9 +381,95 @@ class Comment(db.Model):
     created_at = db.Column(db.DateTime, server_default = db.func.now())
     updated_at = db.Column(db.DateTime, onupdate = db.func.now())
 
-    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'))
-    student_id = db.Column(db.Integer, db.ForeignKey('students.id'))
-    parent_id = db.Column(db.Integer, db.ForeignKey('parents.id'))
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teachers.id'), index=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('students.id'), index=True)
+    parent_id = db.Column(db.Integer, db.ForeignKey('parents.id'), index=True)
+
+    def __repr__(self):
+        return '<Comment %r >' % (self.subject)
+
+class Blob(db.Model):
+    __tablename__ = 'blobs'
+
+    sha256 = db.Column(db.String(64), primary_key = True)
+    size = db.Column(db.Integer, nullable = False)
+    mime_type = db.Column(db.String)
+    filename = db.Column(db.String)
+    page_count = db.Column(db.Integer)
+    scan_status = db.Column(db.String)
+    created_at = db.Column(db.DateTime, server_default = db.func.now())
+
+    def __repr__(self):
+        return '<Blob %r >' % (self.sha256)
+
+class Upload(db.Model):
+    __tablename__ = 'uploads'
+
+    id = db.Column(db.String(32), primary_key = True)
+    filename = db.Column(db.String)
+    mime_type = db.Column(db.String)
+    size = db.Column(db.Integer)
+    received = db.Column(db.Integer, nullable = False, default = 0)
+    created_at = db.Column(db.DateTime, server_default = db.func.now())
+    updated_at = db.Column(db.DateTime, onupdate = db.func.now())
+
+    def __repr__(self):
+        return '<Upload %r >' % (self.id)
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+
+    id = db.Column(db.Integer , primary_key = True)
+    kind = db.Column(db.String, nullable = False)
+    payload = db.Column(db.JSON, nullable = False)
+    status = db.Column(db.String, nullable = False, default = 'queued')
+    attempts = db.Column(db.Integer, nullable = False, default = 0)
+    max_attempts = db.Column(db.Integer, nullable = False, default = 5)
+    idempotency_key = db.Column(db.String, unique = True)
+    result = db.Column(db.JSON)
+    last_error = db.Column(db.String)
+    locked_by = db.Column(db.String)
+    run_at = db.Column(db.DateTime, nullable = False)
+    locked_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, server_default = db.func.now())
+    updated_at = db.Column(db.DateTime, onupdate = db.func.now())
+
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+
+    def __repr__(self):
+        return '<Job %r %r >' % (self.kind, self.status)
+
+class Grade_Aggregate(db.Model):
+    __tablename__ = 'grade_aggregates'
+
+    # source is 'report_card' or 'submission'; 0 stands for every student or course
+    id = db.Column(db.Integer , primary_key = True)
+    source = db.Column(db.String, nullable = False)
+    student_id = db.Column(db.Integer, nullable = False, default = 0)
+    course_id = db.Column(db.Integer, nullable = False, default = 0)
+    count = db.Column(db.Integer, nullable = False, default = 0)
+    total = db.Column(db.Integer, nullable = False, default = 0)
+    total_squares = db.Column(db.Integer, nullable = False, default = 0)
+    min_grade = db.Column(db.Integer)
+    max_grade = db.Column(db.Integer)
+    bucket_0 = db.Column(db.Integer, nullable = False, default = 0)
+    bucket_1 = db.Column(db.Integer, nullable = False, default = 0)
+    bucket_2 = db.Column(db.Integer, nullable = False, default = 0)
+    bucket_3 = db.Column(db.Integer, nullable = False, default = 0)
+    bucket_4 = db.Column(db.Integer, nullable = False, default = 0)
+    bucket_5 = db.Column(db.Integer, nullable = False, default = 0)
+    bucket_6 = db.Column(db.Integer, nullable = False, default = 0)
+    bucket_7 = db.Column(db.Integer, nullable = False, default = 0)
+    bucket_8 = db.Column(db.Integer, nullable = False, default = 0)
+    bucket_9 = db.Column(db.Integer, nullable = False, default = 0)
+    updated_at = db.Column(db.DateTime, server_default = db.func.now(), onupdate = db.func.now())
+
+    __table_args__ = (
+        db.UniqueConstraint('source', 'student_id', 'course_id', name='uq_grade_aggregates_scope'),
+        db.Index('ix_grade_aggregates_course', 'source', 'course_id', 'student_id'),
+    )
 
     def __repr__(self):
-        return '<Comment %r >' % (self.subject)
\ No newline at end of file
+        return '<Grade_Aggregate %r %r %r >' % (self.source, self.student_id, self.course_id)
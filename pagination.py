@@ -0,0 +1,88 @@
+from urllib.parse import urlencode
+from flask import request, make_response
+from sqlalchemy.orm import load_only
+from werkzeug.exceptions import BadRequest
+from config import app
+from loaders import eager
+
+
+def parse_fields(schema):
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+
+    only = tuple(name.strip() for name in fields.split(',') if name.strip())
+    unknown = set(only) - set(schema.fields)
+    if unknown:
+        raise BadRequest(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return only
+
+
+def parse_limit():
+    limit = request.args.get('limit', app.config['PAGINATION_DEFAULT_LIMIT'], type=int)
+    if limit is None or limit < 1:
+        raise BadRequest("limit must be a positive integer")
+    return min(limit, app.config['PAGINATION_MAX_LIMIT'])
+
+
+def read_attributes(field, name, mapper):
+    """Mapped attributes dumping `field` reads: its own column, what a
+    Links block declares, or the foreign keys a relationship is loaded by."""
+    attribute = field.attribute or name
+    if attribute in mapper.relationships:
+        return {
+            prop.key
+            for column in mapper.relationships[attribute].local_columns
+            for prop in [mapper.get_property_by_column(column)]
+        }
+    return {attribute, *getattr(field, 'attributes', ())}
+
+
+def project(query, schema, only):
+    # restrict both the selected columns and the dumped fields to `only`
+    model = query.column_descriptions[0]['entity']
+    mapper = model.__mapper__
+    names = {attribute for name in only for attribute in read_attributes(schema.fields[name], name, mapper)}
+    columns = [
+        getattr(model, name) for name in sorted(names)
+        if name in mapper.column_attrs and not mapper.column_attrs[name].columns[0].primary_key
+    ]
+    if columns:
+        query = query.options(load_only(*columns))
+    return query, schema.__class__(many=True, only=only)
+
+
+def paginate(query, schema):
+    """Dump one keyset page of `query` through `schema`.
+
+    Supports `?after=<id>&limit=<n>&fields=a,b`. The next cursor is sent in the
+    `X-Next-Cursor` and `Link` headers when there are more rows.
+    """
+    model = query.column_descriptions[0]['entity']
+    pk = model.__mapper__.primary_key[0]
+
+    only = parse_fields(schema)
+    if only:
+        query, schema = project(query, schema, only)
+
+    after = request.args.get('after')
+    if after is not None:
+        try:
+            after = pk.type.python_type(after)
+        except ValueError:
+            raise BadRequest("after must be a valid id")
+        query = query.filter(pk > after)
+
+    limit = parse_limit()
+    rows = eager(query, schema).order_by(pk).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    response = make_response(schema.dump(rows), 200)
+    if has_more:
+        cursor = getattr(rows[-1], pk.key)
+        args = request.args.to_dict()
+        args.update(after=cursor, limit=limit)
+        response.headers['X-Next-Cursor'] = str(cursor)
+        response.headers['Link'] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return response
@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+import bcrypt
+from config import app
+from metrics import register, increment, TimingStats
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+workers = app.config['PASSWORD_POOL_WORKERS']
+queue_wait = TimingStats()
+hash_time = TimingStats()
+
+# one slot per worker plus the allowed backlog
+_slots = threading.BoundedSemaphore(workers + app.config['PASSWORD_POOL_QUEUE_DEPTH'])
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    # gunicorn forks after import, so every worker process builds its own pool
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=workers)
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def on_pool(call):
+    """`call(executor)`, run once more on a new pool if a worker process
+    died (OOM kill, segfault) and broke the current one."""
+    global _executor
+    pool = executor()
+    try:
+        return call(pool)
+    except BrokenProcessPool:
+        with _executor_lock:
+            if _executor is pool:
+                _executor = None
+        pool.shutdown(wait=False)
+        increment('password_pool.rebuilt')
+        return call(executor())
+
+
+def check(pwd, hashed):
+    return bcrypt.checkpw(pwd, hashed)
+
+
+def generate(pwd, rounds):
+    return bcrypt.hashpw(pwd, bcrypt.gensalt(rounds))
+
+
+def timed(fn, args, submitted):
+    started = time.monotonic()
+    result = fn(*args)
+    return result, started - submitted, time.monotonic() - started
+
+
+def run_on_pool(fn, *args):
+    """Run `fn(*args)` on the password worker pool. Raises PoolSaturated
+    instead of queueing when the backlog is full."""
+    if not workers:
+        result, waited, took = timed(fn, args, time.monotonic())
+    else:
+        if not _slots.acquire(blocking=False):
+            increment('password_pool.rejected')
+            raise PoolSaturated()
+        try:
+            submitted = time.monotonic()
+            result, waited, took = on_pool(lambda pool: pool.submit(timed, fn, args, submitted).result())
+        finally:
+            _slots.release()
+
+    queue_wait.add(waited)
+    hash_time.add(took)
+    return result
+
+
+def hash_passwords(passwords, rounds):
+    """bcrypt hashes of many passwords on the same pool, `workers` at a
+    time, so a login arriving meanwhile waits behind one round at most."""
+    if not workers:
+        return [generate(pwd, rounds) for pwd in passwords]
+    hashes = []
+    for start in range(0, len(passwords), workers):
+        chunk = passwords[start:start + workers]
+        hashes.extend(on_pool(lambda pool: list(pool.map(generate, chunk, repeat(rounds)))))
+    return hashes
+
+
+def verify_password(hashed, pwd):
+    return run_on_pool(check, pwd.encode('utf-8'), hashed.encode('utf-8'))
+
+
+def hash_password(pwd, rounds=None):
+    rounds = rounds or app.config['BCRYPT_LOG_ROUNDS']
+    return run_on_pool(generate, pwd.encode('utf-8'), rounds).decode('utf-8')
+
+
+def hash_rounds(hashed):
+    # bcrypt hashes look like $2b$<rounds>$<salt+digest>
+    return int(hashed.split('$')[2])
+
+
+def needs_rehash(hashed):
+    return hash_rounds(hashed) != app.config['BCRYPT_LOG_ROUNDS']
+
+
+register('password_pool', lambda: {
+    "workers": workers,
+    "queue_depth": app.config['PASSWORD_POOL_QUEUE_DEPTH'],
+    "queue_wait": queue_wait.stats(),
+    "hash_time": hash_time.stats(),
+})
@@ -0,0 +1,90 @@
+import threading
+from collections import namedtuple
+from flask import session
+from sqlalchemy import inspect
+from config import app
+from cache import LRUCache, invalidate_on_commit
+from metrics import register
+from models import User
+
+
+Principal = namedtuple('Principal', ['email', 'role', 'student_id', 'teacher_id', 'parent_id'])
+
+_sids_by_email = {}
+_lock = threading.Lock()
+
+
+def unindex(sid, principal):
+    with _lock:
+        sids = _sids_by_email.get(principal.email)
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del _sids_by_email[principal.email]
+
+
+principal_cache = LRUCache(
+    maxsize=app.config['PRINCIPAL_CACHE_SIZE'],
+    ttl=app.config['PRINCIPAL_CACHE_TTL'],
+    on_evict=unindex,
+)
+register('principal_cache', principal_cache.stats)
+
+
+def role_of(user):
+    if 'lecturer' in user.email:
+        return 'teacher'
+    elif 'student' in user.email:
+        return 'student'
+    return 'parent'
+
+
+def remember(sid, user):
+    principal = Principal(user.email, role_of(user), user.student_id, user.teacher_id, user.parent_id)
+    # indexed before it is cached, so an eviction straight away still unindexes it
+    forget(sid)
+    with _lock:
+        _sids_by_email.setdefault(user.email, set()).add(sid)
+    principal_cache.set(sid, principal)
+    return principal
+
+
+def forget(sid):
+    principal = principal_cache.pop(sid)
+    if principal:
+        unindex(sid, principal)
+
+
+def current_principal():
+    """The logged in user for this session, resolved from the cache when
+    possible and from the users table otherwise."""
+    email = session.get('user')
+    if not email:
+        return None
+
+    principal = principal_cache.get(session.sid)
+    if principal is None or principal.email != email:
+        user = User.query.filter_by(email=email).first()
+        if user is None:
+            return None
+        principal = remember(session.sid, user)
+    return principal
+
+
+def changed_emails(obj):
+    if not isinstance(obj, User):
+        return ()
+    state = inspect(obj)
+    return {state.dict.get('email'), *state.attrs.email.history.deleted} - {None}
+
+
+def invalidate_principals(emails):
+    with _lock:
+        sids = set()
+        for email in emails:
+            sids.update(_sids_by_email.pop(email, ()))
+    for sid in sids:
+        principal_cache.pop(sid)
+
+
+invalidate_on_commit('principal', changed_emails, invalidate_principals)
@@ -0,0 +1,77 @@
+import re
+import threading
+from sqlalchemy import event
+from config import app, db
+
+
+# SCAN lines that walk a whole table; SEARCH lines and index-only scans are fine
+full_scan_regex = re.compile(r'^SCAN (?!.*\b(?:USING (?:COVERING )?INDEX|USING INTEGER PRIMARY KEY)\b)(\S+)')
+where_regex = re.compile(r'\bWHERE\b', re.IGNORECASE)
+# endpoints that read every row of a table by design
+full_scan_paths = {'/analytics/grades'}
+
+
+def sample_path(rule):
+    """The URL of `rule` with every int argument set to 1, or None when it
+    takes other arguments."""
+    values = {}
+    for argument in rule.arguments:
+        if rule._converters[argument].__class__.__name__ != 'IntegerConverter':
+            return None
+        values[argument] = 1
+    return rule.build(values, append_unknown=False)[1]
+
+
+def record_queries(statements):
+    # only the requests made from this thread, not the job workers
+    thread = threading.get_ident()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() != thread or executemany:
+            return
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    return lambda: [event.remove(engine, 'before_cursor_execute', before_cursor_execute) for engine in engines]
+
+
+def full_scans(connection, statement, parameters):
+    # unfiltered list queries read every row they return anyway
+    if not where_regex.search(statement):
+        return []
+    plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    return [match.group(1) for row in plan if (match := full_scan_regex.match(row[-1]))]
+
+
+def check_query_plans(paths=None, email=None, password=None):
+    """Request every GET endpoint, logged in as `email` if given, and
+    EXPLAIN the queries it ran. Returns a list of (path, table, statement)
+    for each full table scan."""
+    if paths is None:
+        paths = sorted({
+            path for rule in app.url_map.iter_rules()
+            if 'GET' in rule.methods and rule.endpoint != 'static'
+            and (path := sample_path(rule)) is not None
+        } - full_scan_paths)
+
+    problems = []
+    client = app.test_client()
+    if email:
+        client.post('/login', json={"email": email, "password": password})
+    for path in paths:
+        statements = []
+        stop_recording = record_queries(statements)
+        try:
+            client.get(path)
+        finally:
+            stop_recording()
+
+        with app.app_context(), db.engine.connect() as connection:
+            for statement, parameters in statements:
+                for table in full_scans(connection, statement, parameters):
+                    problems.append((path, table, statement))
+    return problems
@@ -0,0 +1,103 @@
+import threading
+from collections import namedtuple
+from functools import wraps
+from flask import request
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from werkzeug.http import generate_etag
+from config import app
+from cache import LRUCache, invalidate_on_commit
+from metrics import register, increment
+from principal import current_principal
+from responses import json_response
+
+
+# pagination headers belong to the page as much as the body does
+KEPT_HEADERS = ('X-Next-Cursor', 'Link')
+
+Entry = namedtuple('Entry', ['versions', 'body', 'etag', 'headers'])
+
+response_cache = LRUCache(
+    maxsize=app.config['RESPONSE_CACHE_SIZE'],
+    ttl=app.config['RESPONSE_CACHE_TTL'],
+)
+
+# table name -> number of committed transactions that wrote to it
+_versions = {}
+_lock = threading.Lock()
+
+register('response_cache', lambda: {**response_cache.stats(), "table_versions": dict(_versions)})
+
+
+def table_versions(tables):
+    with _lock:
+        return tuple(_versions.get(table, 0) for table in tables)
+
+
+def written_tables(obj):
+    state = inspect(obj)
+    tables = {table.name for table in state.mapper.tables}
+    # association rows go with either side's collection, and all of them with a deleted row
+    for relationship in state.mapper.relationships:
+        if relationship.secondary is None:
+            continue
+        if state.deleted or state.was_deleted or state.attrs[relationship.key].history.has_changes():
+            tables.add(relationship.secondary.name)
+    return tables
+
+
+def bump_versions(tables):
+    with _lock:
+        for table in tables:
+            _versions[table] = _versions.get(table, 0) + 1
+
+
+invalidate_on_commit('response_cache', written_tables, bump_versions)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def collect_statement_tables(orm_execute_state):
+    # bulk inserts, updates and deletes skip the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and hasattr(table, 'name'):
+            orm_execute_state.session.info.setdefault('response_cache', set()).add(table.name)
+
+
+def response_key():
+    principal = current_principal()
+    query = tuple(sorted(request.args.items(multi=True)))
+    return (request.base_url, query, principal.role if principal else None)
+
+
+def cached_response(*tables):
+    """Cache the 200 responses of a resource's `get` per URL, query and
+    role. Entries hold the versions of `tables` they were read at, and are
+    only served while none of those tables has been written since."""
+
+    def decorator(get):
+        @wraps(get)
+        def cached(*args, **kwargs):
+            key = response_key()
+            # taken before reading, so a write committing meanwhile leaves the entry stale
+            versions = table_versions(tables)
+            entry = response_cache.get(key)
+            if entry is not None and entry.versions != versions:
+                increment('response_cache.stale')
+                entry = None
+
+            if entry is None:
+                response = get(*args, **kwargs)
+                body = getattr(response, 'encoded_body', None)
+                if response.status_code != 200 or body is None:
+                    return response
+                headers = [(name, response.headers[name]) for name in KEPT_HEADERS if name in response.headers]
+                entry = Entry(versions, body, generate_etag(body.data), headers)
+                response_cache.set(key, entry)
+            else:
+                response = json_response(entry.body, headers=entry.headers)
+
+            response.set_etag(entry.etag)
+            return response.make_conditional(request)
+        return cached
+    return decorator
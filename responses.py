@@ -0,0 +1,149 @@
+import gzip
+from datetime import date, time
+from flask import request, current_app
+from flask.json.provider import DefaultJSONProvider
+from metrics import increment
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Encodes with orjson straight to bytes when it's installed, with the
+    standard library as the fallback for whatever orjson refuses."""
+
+    @staticmethod
+    def default(o):
+        # dates as ISO 8601, the way orjson writes them, whichever encoder runs
+        if isinstance(o, (date, time)):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    def options(self, indent=False):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def encode(self, obj, indent=False):
+        if orjson is not None:
+            try:
+                return orjson.dumps(obj, default=self.default, option=self.options(indent))
+            except TypeError:
+                # ints past 64 bits and the like
+                increment('json.fallback')
+        separators = None if indent else (",", ":")
+        return super().dumps(obj, indent=2 if indent else None, separators=separators).encode()
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return self.encode(obj).decode()
+        return super().dumps(obj, **kwargs)
+
+    def pretty(self):
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self.encoded_response(EncodedBody(self.encode(obj, indent=self.pretty())))
+
+    def encoded_response(self, body, status=200, headers=None):
+        """A response sending `body` as it is, e.g. one kept in a cache."""
+        response = self._app.response_class(body.data, status=status, headers=headers, mimetype=self.mimetype)
+        response.encoded_body = body
+        return response
+
+
+class EncodedBody:
+    """JSON bytes plus their compressed forms, made once on first use so a
+    cached body is never encoded or compressed twice."""
+
+    __slots__ = ('data', '_compressed')
+
+    def __init__(self, data):
+        self.data = data
+        self._compressed = {}
+
+    def __len__(self):
+        return len(self.data)
+
+    def compressed(self, encoding, app):
+        if encoding not in self._compressed:
+            self._compressed[encoding] = compress(self.data, encoding, app)
+        return self._compressed[encoding]
+
+
+def encode(payload):
+    """`payload` encoded once, to cache and send with `json_response`."""
+    return EncodedBody(current_app.json.encode(payload))
+
+
+def json_response(body, status=200, headers=None):
+    return current_app.json.encoded_response(body, status, headers)
+
+
+def compress(data, encoding, app):
+    if encoding == 'br':
+        return brotli.compress(data, quality=app.config['COMPRESS_BROTLI_QUALITY'])
+    return gzip.compress(data, compresslevel=app.config['COMPRESS_GZIP_LEVEL'], mtime=0)
+
+
+def output_json(data, code, headers=None):
+    """Flask-RESTful representation for resources returning plain data."""
+    response = current_app.json.response(data)
+    response.status_code = code
+    response.headers.extend(headers or {})
+    return response
+
+
+def negotiate_encoding():
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(offered)
+
+
+def configure_responses(app, api):
+    app.json = FastJSONProvider(app)
+    api.representations['application/json'] = output_json
+
+    @app.after_request
+    def compress_response(response):
+        response.vary.add('Accept-Encoding')
+        if (
+            response.direct_passthrough
+            or response.status_code not in (200, 201, 202)
+            or response.mimetype not in app.config['COMPRESS_MIMETYPES']
+            or 'Content-Encoding' in response.headers
+            or 'no-transform' in response.cache_control
+        ):
+            return response
+
+        body = getattr(response, 'encoded_body', None)
+        length = len(body) if body is not None else response.calculate_content_length()
+        if length is None or length < app.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        encoding = negotiate_encoding()
+        if encoding is None:
+            return response
+        if body is not None:
+            data = body.compressed(encoding, app)
+        else:
+            data = compress(response.get_data(), encoding, app)
+
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        increment(f'compression.{encoding}')
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # the compressed bytes differ, so a strong validator can't be shared
+            response.set_etag(etag, weak=True)
+        return response
@@ -0,0 +1,195 @@
+import re
+import threading
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from sqlalchemy import inspect, select
+from config import app, db
+from cache import LRUCache, invalidate_on_commit
+from intervals import IntervalTree
+from metrics import register
+from models import Event, Course, Student, Teacher, course_student, course_teacher
+
+
+Entry = namedtuple('Entry', ['kind', 'id', 'title', 'days', 'first', 'last', 'start_time', 'end_time', 'all_day', 'course_id'])
+
+OWNERS = {
+    'student': (Event.student_id, course_student.c.student_id),
+    'teacher': (Event.teacher_id, course_teacher.c.teacher_id),
+}
+
+# the interval index of each owner's schedule and the windows expanded from it
+schedule_cache = LRUCache(
+    maxsize=app.config['CALENDAR_CACHE_SIZE'],
+    ttl=app.config['CALENDAR_CACHE_TTL'],
+)
+ALL = object()
+_windows = {}
+_lock = threading.Lock()
+
+
+def forget_window(key, occurrences):
+    owner = key[:2]
+    with _lock:
+        windows = _windows.get(owner)
+        if windows is not None:
+            windows.discard(key)
+            if not windows:
+                del _windows[owner]
+
+
+calendar_cache = LRUCache(
+    maxsize=app.config['CALENDAR_CACHE_SIZE'],
+    ttl=app.config['CALENDAR_CACHE_TTL'],
+    on_evict=forget_window,
+)
+register('calendar_cache', calendar_cache.stats)
+
+
+def parse_days(days_of_week):
+    """FullCalendar weekdays (0 is Sunday) from '1,3' or [1, 3]."""
+    if days_of_week in (None, '', []):
+        return None
+    return frozenset(int(day) for day in re.findall(r'\d', str(days_of_week)))
+
+
+def weekday(day):
+    return day.isoweekday() % 7
+
+
+def entry_for(obj, kind=None):
+    """The recurrence of an event or course, or of a row of their columns
+    when `kind` is given. `first` and `last` are the first and last dates
+    it can occur on; FullCalendar's endRecur and end are exclusive. None
+    when it never occurs."""
+    days = parse_days(obj.daysOfWeek)
+    kind = kind or ('event' if isinstance(obj, Event) else 'course')
+    if kind == 'event':
+        kind, all_day, course_id = 'event', bool(obj.allDay), obj.course_id
+    else:
+        kind, all_day, course_id = 'course', False, obj.id
+
+    if days is not None:
+        first = obj.startRecur or getattr(obj, 'start', None) or date.min
+        last = obj.endRecur - timedelta(days=1) if obj.endRecur else date.max
+    elif kind == 'course':
+        # a course without weekdays never meets
+        return None
+    else:
+        first = obj.start
+        last = obj.end - timedelta(days=1) if obj.end and obj.end > obj.start else obj.start
+
+    title = obj.title if kind == 'event' else obj.course_name
+    return Entry(kind, obj.id, title, days, first, last, obj.startTime, obj.endTime, all_day, course_id)
+
+
+def occurrence(entry, day):
+    if entry.all_day or entry.start_time is None:
+        start, end = day.isoformat(), None
+    else:
+        start = datetime.combine(day, entry.start_time).isoformat(timespec='minutes')
+        end = datetime.combine(day, entry.end_time).isoformat(timespec='minutes') if entry.end_time else None
+    return {
+        "type": entry.kind,
+        "id": entry.id,
+        "title": entry.title,
+        "start": start,
+        "end": end,
+        "allDay": entry.all_day or entry.start_time is None,
+        "course_id": entry.course_id,
+    }
+
+
+def expand(entry, start, end):
+    """Occurrences of `entry` between the dates `start` and `end` inclusive."""
+    lo, hi = max(start, entry.first), min(end, entry.last)
+    if lo > hi:
+        return []
+    if entry.days is None:
+        return [occurrence(entry, lo)]
+
+    days = []
+    for day in entry.days:
+        # first date on or after lo falling on that weekday, then every week
+        current = lo + timedelta(days=(day - weekday(lo)) % 7)
+        while current <= hi:
+            days.append(current)
+            current += timedelta(days=7)
+    return [occurrence(entry, day) for day in sorted(days)]
+
+
+def load_schedule(role, owner_id):
+    event_column, course_column = OWNERS[role]
+    events = db.session.scalars(select(Event).where(event_column == owner_id))
+    courses = db.session.scalars(
+        select(Course).join(course_column.table, course_column.table.c.course_id == Course.id)
+        .where(course_column == owner_id)
+    )
+    entries = [entry_for(obj) for obj in (*events, *courses)]
+    return IntervalTree((entry.first, entry.last, entry) for entry in entries if entry)
+
+
+def owner_schedule(role, owner_id):
+    key = (role, owner_id)
+    schedule = schedule_cache.get(key)
+    if schedule is None:
+        schedule = load_schedule(role, owner_id)
+        schedule_cache.set(key, schedule)
+    return schedule
+
+
+def calendar(role, owner_id, start, end):
+    """Every occurrence on `role` `owner_id`'s calendar between the dates
+    `start` and `end` inclusive, in order of start."""
+    key = (role, owner_id, start, end)
+    occurrences = calendar_cache.get(key)
+    if occurrences is None:
+        occurrences = [
+            item
+            for _, _, entry in owner_schedule(role, owner_id).overlapping(start, end)
+            for item in expand(entry, start, end)
+        ]
+        occurrences.sort(key=lambda item: item['start'])
+        # tracked first, so forget_window finds it even if this very set evicts it
+        with _lock:
+            _windows.setdefault((role, owner_id), set()).add(key)
+        calendar_cache.set(key, occurrences)
+    return occurrences
+
+
+def affected_owners(obj):
+    state = inspect(obj)
+    if isinstance(obj, Course):
+        # course times show up on every enrolled calendar
+        return {ALL}
+    if isinstance(obj, Event):
+        owners = set()
+        for role, (column, _) in OWNERS.items():
+            history = state.attrs[column.key].history
+            for value in (*history.sum(), state.dict.get(column.key)):
+                if value is not None:
+                    owners.add((role, value))
+        return owners
+    if isinstance(obj, (Student, Teacher)) and state.attrs.courses.history.has_changes():
+        return {('student' if isinstance(obj, Student) else 'teacher', obj.id)}
+    return ()
+
+
+def invalidate_calendars(owners):
+    if ALL in owners:
+        with _lock:
+            _windows.clear()
+        schedule_cache.clear()
+        calendar_cache.clear()
+        return
+
+    with _lock:
+        stale = set()
+        for owner in owners:
+            stale.update(_windows.pop(owner, ()))
+    for owner in owners:
+        schedule_cache.pop(owner)
+    for key in stale:
+        calendar_cache.pop(key)
+
+
+invalidate_on_commit('calendar', affected_owners, invalidate_calendars)
@@ -0,0 +1,173 @@
+import keyword
+import threading
+from contextlib import contextmanager
+from flask import json
+from marshmallow import fields, missing
+from marshmallow.decorators import PRE_DUMP, POST_DUMP
+from config import mash
+from metrics import increment
+
+
+# field classes whose _serialize leaves a value of this exact type as it is
+PASSTHROUGH = {fields.Integer: int, fields.String: str, fields.Boolean: bool, fields.Float: float}
+
+_compiled = {}
+_compiling = set()
+_lock = threading.RLock()
+_local = threading.local()
+
+
+def variant(schema):
+    # `only` tells apart variants that restrict nested fields, like 'courses.id'
+    return (
+        type(schema), tuple(schema.dump_fields),
+        frozenset(schema.only) if schema.only is not None else None, frozenset(schema.exclude),
+    )
+
+
+def compilable(schema):
+    if not isinstance(schema, CompiledSchema):
+        return False
+    if schema._has_processors(PRE_DUMP) or schema._has_processors(POST_DUMP):
+        return False
+    if schema.get_attribute.__func__ is not mash.SQLAlchemySchema.get_attribute:
+        return False
+    return all(
+        not field._CHECK_ATTRIBUTE or (field.attribute or name).isidentifier() and not keyword.iskeyword(field.attribute or name)
+        for name, field in schema.dump_fields.items()
+    )
+
+
+def nested_dump(field):
+    """Compiled dump of a Nested field's schema, returning one dict or a
+    list of them like the field would, or None when it can't be compiled."""
+    schema = field.schema
+    dump = compile_schema(schema)
+    if dump is None:
+        return None
+    if schema.many or field.many:
+        return lambda value: [dump(item) for item in value]
+    return dump
+
+
+def expression(n, name, field, namespace):
+    """Python source for the dumped value of field `n`, held in `v<n>`."""
+    value, serialize = f'v{n}', f'f{n}'
+    namespace[serialize] = field._serialize
+    fallback = f'{serialize}({value}, {name!r}, obj)'
+
+    kind = PASSTHROUGH.get(type(field))
+    if kind is not None and not getattr(field, 'as_string', False):
+        namespace[f't{n}'] = kind
+        return f'{value} if {value} is None or {value}.__class__ is t{n} else {fallback}'
+    if type(field) is fields.Raw:
+        return value
+
+    inner = field.inner if isinstance(field, fields.List) and type(field) is fields.List else None
+    nested = inner if isinstance(inner, fields.Nested) else field if type(field) is fields.Nested else None
+    dump = nested_dump(nested) if nested is not None else None
+    if dump is None:
+        return fallback
+    namespace[f'd{n}'] = dump
+    if inner is not None:
+        # List._serialize hands every item, None included, to the Nested field
+        return f'None if {value} is None else [None if item is None else d{n}(item) for item in {value}]'
+    return f'None if {value} is None else d{n}({value})'
+
+
+def compile_schema(schema):
+    """A function dumping one object exactly like `schema.dump` does, built
+    once per schema class and set of dump fields. None when the schema uses
+    something the generated code doesn't cover, and marshmallow has to dump it."""
+    key = variant(schema)
+    with _lock:
+        if key in _compiled:
+            return _compiled[key]
+        # a schema nesting itself is left to marshmallow below the first level
+        if key in _compiling or not compilable(schema):
+            return None
+
+        _compiling.add(key)
+        try:
+            namespace = {'missing': missing}
+            lines = ['def dump(obj):']
+            items, skippable = [], []
+            for n, (name, field) in enumerate(schema.dump_fields.items()):
+                attr = field.attribute or name
+                lines.append(f'    v{n} = obj.{attr}' if field._CHECK_ATTRIBUTE else f'    v{n} = None')
+                key_name = field.data_key if field.data_key is not None else name
+                items.append(f'        {key_name!r}: {expression(n, name, field, namespace)},')
+                if getattr(field, 'skippable', False):
+                    skippable.append(key_name)
+            lines += ['    data = {', *items, '    }']
+            # fields that can return missing are dropped afterwards, keeping the order of the rest
+            lines += [f'    if data[{key_name!r}] is missing:\n        del data[{key_name!r}]' for key_name in skippable]
+            lines.append('    return data')
+
+            exec(compile('\n'.join(lines), f'<dump {type(schema).__name__}>', 'exec'), namespace)
+            _compiled[key] = namespace['dump']
+        finally:
+            _compiling.discard(key)
+        return _compiled[key]
+
+
+class CompiledSchema(mash.SQLAlchemySchema):
+    """Dumps through a function generated from the schema's fields instead
+    of walking them for every object. Anything the generated code can't
+    handle, such as None or objects lacking an attribute, goes through
+    marshmallow as before."""
+
+    def dump(self, obj, *, many=None):
+        many = self.many if many is None else bool(many)
+        dump = compile_schema(self) if obj is not None and not getattr(_local, 'uncompiled', False) else None
+        if dump is None:
+            return super().dump(obj, many=many)
+        try:
+            return [dump(item) for item in obj] if many else dump(obj)
+        except AttributeError as e:
+            # only an object without one of the fields goes to marshmallow, errors raised further in are real
+            if not raised_by_generated_code(e):
+                raise
+            increment('serializers.fallback')
+            return super().dump(obj, many=many)
+
+
+def raised_by_generated_code(error):
+    tb = error.__traceback__
+    while tb.tb_next is not None:
+        tb = tb.tb_next
+    return tb.tb_frame.f_code.co_filename.startswith('<dump ')
+
+
+@contextmanager
+def uncompiled():
+    """Dump through marshmallow alone in this thread, nested schemas included."""
+    _local.uncompiled = True
+    try:
+        yield
+    finally:
+        _local.uncompiled = False
+
+
+def compile_schemas(schemas):
+    for schema in schemas:
+        compile_schema(schema)
+
+
+def check_serializers(schemas, limit=200):
+    """Dump up to `limit` rows of each schema's model through the compiled
+    functions and through marshmallow, for every schema and every single
+    field `only=` variant. Returns (schema, fields, row, compiled, expected)
+    for each row that differs."""
+    problems = []
+    for schema in schemas:
+        rows = schema.opts.model.query.limit(limit).all()
+        variants = [schema] + [type(schema)(only=(name,)) for name in schema.dump_fields]
+        for current in variants:
+            for row in rows:
+                compiled = json.dumps(current.dump(row, many=False))
+                with uncompiled():
+                    expected = json.dumps(current.dump(row, many=False))
+                if compiled != expected:
+                    problems.append((type(schema).__name__, tuple(current.dump_fields), row, compiled, expected))
+    return problems
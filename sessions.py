@@ -0,0 +1,139 @@
+import os
+import pickle
+import struct
+import threading
+import time
+from datetime import datetime
+from flask.json.tag import TaggedJSONSerializer
+from sqlalchemy import delete, select
+
+
+_sweeper_pid = None
+_sweeper_lock = threading.Lock()
+
+
+def configure_session_backend(app, db):
+    """Fill in the Flask-Session settings for the backend named by
+    `SESSION_TYPE` (sqlalchemy, filesystem or redis)."""
+    backend = app.config['SESSION_TYPE']
+
+    if backend == 'sqlalchemy':
+        app.config['SESSION_SQLALCHEMY'] = db
+    elif backend == 'filesystem':
+        # pointing this at /dev/shm keeps sessions in shared memory for all workers
+        app.config.setdefault('SESSION_FILE_DIR', os.path.join(app.instance_path, 'sessions'))
+        # past its default of 500 files cachelib deletes live sessions to make
+        # room, so there is no limit and the sweeper removes expired ones
+        app.config.setdefault('SESSION_FILE_THRESHOLD', 0)
+        os.makedirs(app.config['SESSION_FILE_DIR'], exist_ok=True)
+    elif backend == 'redis':
+        # anything that speaks the Redis protocol works here
+        import redis
+        app.config['SESSION_REDIS'] = redis.from_url(app.config['SESSION_REDIS_URL'])
+    else:
+        raise ValueError(f"Unsupported SESSION_TYPE: {backend}")
+
+
+class SessionSerializer:
+    """Session data as compact tagged JSON, the format of Flask's own cookie
+    sessions, instead of pickle. Sessions pickled before the switch are
+    still read, and written back as JSON."""
+
+    def __init__(self):
+        self.tagged = TaggedJSONSerializer()
+
+    def dumps(self, data):
+        return self.tagged.dumps(data).encode()
+
+    def loads(self, data):
+        if data[:1] == b'\x80':
+            return pickle.loads(data)
+        return self.tagged.loads(data.decode())
+
+    # the file-like interface cachelib's FileSystemCache uses
+    def dump(self, data, f):
+        f.write(self.dumps(data))
+
+    def load(self, f):
+        return self.loads(f.read())
+
+
+def configure_session_serializer(app):
+    """Swap pickle for SessionSerializer in the interface Flask-Session set up."""
+    interface = app.session_interface
+    if app.config['SESSION_TYPE'] == 'filesystem':
+        interface.cache.serializer = SessionSerializer()
+    else:
+        interface.serializer = SessionSerializer()
+
+
+def sweep_sqlalchemy(interface, db, batch_size):
+    model = interface.sql_session_model
+    removed = 0
+    while True:
+        expired = select(model.id).where(model.expiry < datetime.utcnow()).limit(batch_size)
+        result = db.session.execute(delete(model).where(model.id.in_(expired)))
+        db.session.commit()
+        removed += result.rowcount
+        if result.rowcount < batch_size:
+            return removed
+
+
+def sweep_filesystem(cache_dir):
+    # cachelib prefixes every entry with its expiry as a 4 byte timestamp
+    now = time.time()
+    removed = 0
+    with os.scandir(cache_dir) as entries:
+        for entry in entries:
+            try:
+                with open(entry.path, 'rb') as f:
+                    expires = struct.unpack('I', f.read(4))[0]
+                if expires and expires < now:
+                    os.remove(entry.path)
+                    removed += 1
+            except (OSError, struct.error):
+                continue
+    return removed
+
+
+def sweep_sessions(app, db):
+    """Delete expired sessions, returning how many were removed. Redis
+    expires its keys on its own, so there is nothing to do there."""
+    backend = app.config['SESSION_TYPE']
+
+    if backend == 'sqlalchemy':
+        return sweep_sqlalchemy(app.session_interface, db, app.config['SESSION_SWEEP_BATCH_SIZE'])
+    elif backend == 'filesystem':
+        return sweep_filesystem(app.config['SESSION_FILE_DIR'])
+    return 0
+
+
+def start_session_sweeper(app, db):
+    interval = app.config['SESSION_SWEEP_INTERVAL']
+    if not interval:
+        return None
+
+    def run():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    sweep_sessions(app, db)
+                except Exception:
+                    app.logger.exception("Session sweep failed")
+
+    sweeper = threading.Thread(target=run, name='session-sweeper', daemon=True)
+    sweeper.start()
+    return sweeper
+
+
+def ensure_session_sweeper(app, db):
+    """Start the sweeper once per serving process, from the first request,
+    so CLI commands and imports don't start one."""
+    global _sweeper_pid
+    if _sweeper_pid == os.getpid():
+        return
+    with _sweeper_lock:
+        if _sweeper_pid != os.getpid():
+            start_session_sweeper(app, db)
+            _sweeper_pid = os.getpid()
@@ -0,0 +1,238 @@
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+import uuid
+from flask import Request, request, send_file
+from sqlalchemy.dialects.sqlite import insert
+from werkzeug.exceptions import NotFound, Forbidden
+from werkzeug.http import is_resource_modified
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
+from config import app, db
+from models import Blob, Upload
+
+
+CHUNK_SIZE = 64 * 1024
+sha256_regex = re.compile(r'^[0-9a-f]{64}$')
+
+
+def blob_path(sha256):
+    root = app.config['BLOB_STORE_PATH']
+    return os.path.join(root, sha256[:2], sha256[2:4], sha256)
+
+
+def scratch_path(name=''):
+    path = os.path.join(app.config['BLOB_STORE_PATH'], 'tmp')
+    os.makedirs(path, exist_ok=True)
+    return os.path.join(path, name)
+
+
+def copy_hashing(stream, out, digest):
+    size = 0
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+        out.write(chunk)
+        digest.update(chunk)
+        size += len(chunk)
+    return size
+
+
+def add_blob(tmp_path, sha256, size, filename, mime_type):
+    # identical content is only ever kept once
+    path = blob_path(sha256)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+
+    db.session.execute(
+        insert(Blob)
+        .values(sha256=sha256, size=size, mime_type=mime_type, filename=filename)
+        .on_conflict_do_nothing()
+    )
+    return sha256
+
+
+def store_stream(stream, filename=None, mime_type=None):
+    """Stream `stream` into the content-addressed store, hashing as it is
+    written. Returns the sha256 the content is stored under."""
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=scratch_path(), delete=False) as tmp:
+        size = copy_hashing(stream, tmp, digest)
+    mime_type = mime_type or mimetypes.guess_type(filename or '')[0]
+    return add_blob(tmp.name, digest.hexdigest(), size, filename, mime_type)
+
+
+class ScratchFile:
+    """A multipart file part, written by werkzeug's form parser straight
+    into the blob store's scratch directory and hashed on the way, so
+    storing it is a rename rather than a second copy. Deleted when the
+    request closes it, unless it was stored."""
+
+    def __init__(self):
+        self.file = tempfile.NamedTemporaryFile(dir=scratch_path(), delete=False)
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.stored = False
+
+    def write(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __iter__(self):
+        return iter(self.file)
+
+    def close(self):
+        self.file.close()
+        if not self.stored:
+            try:
+                os.remove(self.file.name)
+            except FileNotFoundError:
+                pass
+
+    def store(self, filename, mime_type):
+        self.file.close()
+        self.stored = True
+        return add_blob(self.file.name, self.digest.hexdigest(), self.size, filename, mime_type)
+
+
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return ScratchFile()
+
+
+def configure_uploads(app):
+    app.request_class = UploadRequest
+
+
+def store_upload(file):
+    filename = secure_filename(file.filename)
+    mime_type = mimetypes.guess_type(filename)[0] or file.mimetype
+    if isinstance(file.stream, ScratchFile):
+        return file.stream.store(filename, mime_type)
+    return store_stream(file.stream, filename, mime_type)
+
+
+def is_blob(name):
+    return bool(name) and bool(sha256_regex.match(name))
+
+
+def send_path(path, etag=True, immutable=False, **kwargs):
+    """send_file with conditional GET and Range support, optionally handing
+    the bytes to a front proxy via X-Sendfile or X-Accel-Redirect."""
+    accel = app.config['FILE_OFFLOAD'] == 'x-accel'
+    response = send_file(path, etag=etag, conditional=not accel, **kwargs)
+
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    else:
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+
+    if accel:
+        # the proxy serves the bytes and ranges, only answer revalidations here
+        response.close()
+        response.response = []
+        response.headers.pop('Content-Length', None)
+        if not is_resource_modified(request.environ, etag=response.get_etag()[0], last_modified=response.last_modified):
+            response.status_code = 304
+        else:
+            relative = os.path.relpath(path, app.config['FILE_OFFLOAD_ROOT'])
+            response.headers['X-Accel-Redirect'] = f"{app.config['FILE_ACCEL_PREFIX'].rstrip('/')}/{relative}"
+    return response
+
+
+def send_blob(sha256, **kwargs):
+    blob = db.session.get(Blob, sha256) if is_blob(sha256) else None
+    if blob is None:
+        raise NotFound()
+    if blob.scan_status == 'infected':
+        raise Forbidden()
+    return send_path(
+        os.path.abspath(blob_path(blob.sha256)),
+        etag=blob.sha256,
+        mimetype=blob.mime_type,
+        download_name=blob.filename or blob.sha256,
+        **kwargs
+    )
+
+
+def stored_path(name, legacy_dir):
+    """Absolute path of a stored file: a blob when `name` is a known hash,
+    otherwise a file in the flat upload directory it was saved to."""
+    if is_blob(name) and db.session.get(Blob, name):
+        return os.path.abspath(blob_path(name))
+
+    path = safe_join(os.path.abspath(legacy_dir), name or '')
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+    return path
+
+
+def send_stored(name, legacy_dir, **kwargs):
+    """Send a stored file, falling back to the flat upload directories for
+    files saved before the blob store existed."""
+    if is_blob(name) and db.session.get(Blob, name):
+        return send_blob(name, **kwargs)
+    return send_path(stored_path(name, legacy_dir), **kwargs)
+
+
+# resumable uploads: create, append chunks at the current offset, complete
+
+def part_path(upload):
+    return scratch_path(f'{upload.id}.part')
+
+
+def start_upload(filename=None, mime_type=None, size=None):
+    upload = Upload(
+        id=uuid.uuid4().hex,
+        filename=secure_filename(filename) if filename else None,
+        mime_type=mime_type,
+        size=size,
+        received=0,
+    )
+    open(part_path(upload), 'wb').close()
+    db.session.add(upload)
+    db.session.commit()
+    return upload
+
+
+def append_upload(upload, offset, stream):
+    """Append `stream` to the upload if `offset` matches what has been
+    received so far. Returns False on an offset mismatch."""
+    if offset != upload.received:
+        return False
+
+    with open(part_path(upload), 'r+b') as part:
+        part.truncate(upload.received)
+        part.seek(upload.received)
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+            part.write(chunk)
+        upload.received = part.tell()
+
+    db.session.commit()
+    return True
+
+
+def complete_upload(upload):
+    digest = hashlib.sha256()
+    path = part_path(upload)
+    with open(path, 'rb') as part:
+        for chunk in iter(lambda: part.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+
+    mime_type = upload.mime_type or mimetypes.guess_type(upload.filename or '')[0]
+    sha256 = add_blob(path, digest.hexdigest(), upload.received, upload.filename, mime_type)
+    db.session.delete(upload)
+    db.session.commit()
+    return sha256
@@ -0,0 +1,66 @@
+import re
+import shlex
+import subprocess
+from config import app, db
+from jobs import job, enqueue
+from models import Blob
+from storage import blob_path, CHUNK_SIZE
+from thumbnails import generate_thumbnails
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+
+page_regex = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+
+
+def count_pages(path):
+    if PdfReader is not None:
+        return len(PdfReader(path).pages)
+
+    # without pypdf, count page objects; misses pages inside compressed object streams
+    count, tail = 0, b''
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            # matches inside the carried over tail were counted last round
+            data = tail + chunk
+            count += len(page_regex.findall(data)) - len(page_regex.findall(tail))
+            tail = data[-32:]
+    return count
+
+
+def scan(path):
+    """Run UPLOAD_SCAN_COMMAND (e.g. `clamdscan --no-summary`) on `path`.
+    Exit status 0 means clean and 1 infected; anything else is retried."""
+    command = app.config['UPLOAD_SCAN_COMMAND']
+    if not command:
+        return None
+
+    outcome = subprocess.run([*shlex.split(command), path], capture_output=True, timeout=300)
+    if outcome.returncode == 0:
+        return 'clean'
+    elif outcome.returncode == 1:
+        return 'infected'
+    raise RuntimeError(f"Scan failed: {outcome.stderr.decode(errors='replace')}")
+
+
+@job('process_upload')
+def process_upload(sha256):
+    blob = db.session.get(Blob, sha256)
+    path = blob_path(sha256)
+
+    blob.scan_status = scan(path)
+    if blob.scan_status != 'infected':
+        if (blob.mime_type or '').startswith('image/'):
+            generate_thumbnails(sha256, app.config['IMAGE_UPLOAD_PATH'])
+        elif blob.mime_type == 'application/pdf':
+            blob.page_count = count_pages(path)
+
+    db.session.commit()
+    return {"scan_status": blob.scan_status, "page_count": blob.page_count}
+
+
+def queue_upload_processing(sha256):
+    return enqueue('process_upload', {"sha256": sha256}, key=f'process_upload:{sha256}')
@@ -0,0 +1,76 @@
+import os
+import sys
+import tempfile
+from datetime import date, time
+
+# the app reads these at import, so they are set before anything imports it
+_tmp = tempfile.mkdtemp(prefix='goldworth-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmp, 'lms.db')}"
+os.environ['JOB_WORKER_THREADS'] = '0'
+os.environ['SESSION_SWEEP_INTERVAL'] = '0'
+os.environ['PASSWORD_POOL_WORKERS'] = '0'
+os.environ['BCRYPT_LOG_ROUNDS'] = '4'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from app import app
+from config import db
+from models import Teacher, Student, Parent, Course, Content, Report_Card, Assignment, Submitted_Assignment, Event, Saved_Content, Comment
+
+
+_batches = iter(range(1000))
+
+
+def add_rows():
+    """One more teacher, parent and course, with two students and what
+    hangs off them, so list endpoints have more rows to load each time."""
+    n = next(_batches)
+    teacher = Teacher(firstname='Ann', lastname=f'Lee {n}', personal_email=f't{n}@example.com',
+                      email=f'lee.{n}@lecturer.goldworth.com', password=f'tpw{n}', expertise='Web', department='IT')
+    parent = Parent(firstname='Pat', lastname=f'Doe {n}', email=f'pat.{n}@example.com', password=f'ppw{n}')
+    db.session.add_all([teacher, parent])
+    db.session.flush()
+    teacher.add_user()
+    parent.add_user()
+
+    course = Course(course_name=f'Course {n}', description='Tests', daysOfWeek='1,3',
+                    startRecur=date(2026, 1, 1), endRecur=date(2026, 12, 31), startTime=time(9), endTime=time(10))
+    course.teachers.append(teacher)
+    db.session.add(course)
+    db.session.flush()
+    db.session.add(Content(content_name=f'Notes {n}', description='Notes', content_type='pdf', course_id=course.id, teacher_id=teacher.id))
+    db.session.add(Assignment(assignment_name=f'Assignment {n}', topic='Loops', content='Write one', course_id=course.id, teacher_id=teacher.id))
+
+    for k in range(2):
+        student = Student(firstname=f'S{k}', lastname=f'X {n}', personal_email=f's{n}.{k}@example.com',
+                          email=f's{n}.{k}@student.goldworth.com', password=f'spw{n}{k}', parent_id=parent.id)
+        student.courses.append(course)
+        db.session.add(student)
+        db.session.flush()
+        student.add_user()
+        db.session.add(Report_Card(topic='Loops', grade=60 + k, teacher_remarks='Good', student_id=student.id, course_id=course.id, teacher_id=teacher.id))
+        db.session.add(Submitted_Assignment(assignment_name=f'Assignment {n}', content='Done', course_id=course.id, student_id=student.id))
+        db.session.add(Event(groupId=n, start=date(2026, 1, 5), end=date(2026, 12, 1), daysOfWeek='1,3', startTime=time(9), endTime=time(10),
+                             startRecur=date(2026, 1, 1), endRecur=date(2026, 12, 31), title=course.course_name,
+                             course_id=course.id, student_id=student.id, teacher_id=teacher.id))
+        db.session.add(Saved_Content(content_name=f'Notes {n}', content_type='pdf', course_id=course.id, student_id=student.id))
+        db.session.add(Comment(title='Question', subject='Loops', content='How?', teacher_id=teacher.id, student_id=student.id))
+    db.session.commit()
+
+
+@pytest.fixture(scope='session', autouse=True)
+def database():
+    with app.app_context():
+        db.create_all()
+        for _ in range(3):
+            add_rows()
+    yield
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
@@ -0,0 +1,24 @@
+from app import app
+from config import db
+from models import Course, Teacher
+
+
+def test_co_teacher_change_reaches_the_teacher_dashboard(client):
+    with app.app_context():
+        course = db.session.get(Course, 1)
+        co_teacher = Teacher(firstname='Bo', lastname='Kim', personal_email='bo.kim@example.com',
+                             email='bo.kim@lecturer.goldworth.com', password='bpw', expertise='Maths', department='IT')
+        course.teachers.append(co_teacher)
+        db.session.commit()
+        co_teacher_id = co_teacher.id
+
+    def co_teacher_expertise():
+        dashboard = client.get('/checksession').get_json()
+        course = next(course for course in dashboard['courses'] if course['id'] == 1)
+        return next(teacher['expertise'] for teacher in course['teachers'] if teacher['firstname'] == 'Bo')
+
+    assert client.post('/login', json={"email": 'lee.0@lecturer.goldworth.com', "password": 'tpw0'}).status_code == 200
+    assert co_teacher_expertise() == 'Maths'
+
+    client.patch(f'/teachers/{co_teacher_id}', json={"expertise": 'Physics'})
+    assert co_teacher_expertise() == 'Physics'
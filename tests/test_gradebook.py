@@ -0,0 +1,31 @@
+import pytest
+from app import app
+from config import db
+from models import Report_Card, Submitted_Assignment
+
+
+@pytest.mark.parametrize('path, model', [('/report-cards/1', Report_Card), ('/submitted-assignments/1', Submitted_Assignment)])
+@pytest.mark.parametrize('grade', ['A', 'ninety', 90.5, True, [90]])
+def test_grade_that_is_not_an_integer_is_rejected(client, path, model, grade):
+    with app.app_context():
+        before = db.session.get(model, 1).grade
+
+    response = client.patch(path, json={"grade": grade})
+    assert response.status_code == 400
+    assert response.get_json() == {"message": "grade must be an integer"}
+
+    with app.app_context():
+        assert db.session.get(model, 1).grade == before
+
+
+def test_new_grade_is_counted(client):
+    with app.app_context():
+        report_card = db.session.get(Report_Card, 1)
+        student_id, course_id, grade = report_card.student_id, report_card.course_id, report_card.grade
+
+    response = client.patch('/report-cards/1', json={"grade": 95})
+    assert response.status_code == 202
+    summary = client.get(f'/gradebook/students/{student_id}?course_id={course_id}').get_json()['report_cards']
+    assert summary['max'] == 95
+
+    client.patch('/report-cards/1', json={"grade": grade})
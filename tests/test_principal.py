@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+import principal
+from principal import principal_cache, remember
+
+
+def user(n):
+    return SimpleNamespace(email=f's{n}@student.goldworth.com', student_id=n, teacher_id=None, parent_id=None)
+
+
+def indexed_sids():
+    return {sid for sids in principal._sids_by_email.values() for sid in sids}
+
+
+def test_evicted_sessions_leave_the_index(monkeypatch):
+    principal_cache.clear()
+    monkeypatch.setattr(principal, '_sids_by_email', {})
+    monkeypatch.setattr(principal_cache, 'maxsize', 2)
+    for n in range(5):
+        remember(f'sid-{n}', user(n))
+    assert indexed_sids() == {'sid-3', 'sid-4'}
+
+
+def test_expired_sessions_leave_the_index(monkeypatch):
+    principal_cache.clear()
+    monkeypatch.setattr(principal, '_sids_by_email', {})
+    monkeypatch.setattr(principal_cache, 'ttl', -1)
+    remember('sid-0', user(0))
+    assert principal_cache.get('sid-0') is None
+    assert principal._sids_by_email == {}
+
+
+def test_a_session_logging_in_as_someone_else_moves_in_the_index(monkeypatch):
+    principal_cache.clear()
+    monkeypatch.setattr(principal, '_sids_by_email', {})
+    remember('sid-0', user(0))
+    remember('sid-0', user(1))
+    assert principal._sids_by_email == {user(1).email: {'sid-0'}}
@@ -0,0 +1,61 @@
+import pytest
+from app import app
+from query_plans import record_queries
+from response_cache import response_cache
+from conftest import add_rows
+
+
+# SELECTs per request, the same however many rows there are: one for the
+# rows, then one per eager-loaded collection in the response schema
+EXPECTED = {
+    '/users': 1,
+    '/students': 9,
+    '/students/1': 9,
+    '/teachers': 5,
+    '/teachers/1': 5,
+    '/parents': 2,
+    '/parents/1': 2,
+    '/contents': 1,
+    '/contents/1': 1,
+    '/courses': 3,
+    '/courses/1': 3,
+    '/report-cards': 1,
+    '/report-cards/1': 1,
+    '/assignments': 1,
+    '/assignments/1': 1,
+    '/submitted-assignments': 1,
+    '/submitted-assignments/1': 1,
+    '/events': 1,
+    '/events/1': 1,
+    '/saved_contents': 1,
+    '/comments': 1,
+    '/comments/1': 1,
+    # projections load the columns their links and nested fields read
+    '/users?fields=student_id,parent_url': 1,
+    '/users?fields=email,teacher_url,student_url': 1,
+    '/assignments?fields=assignment_name,url': 1,
+    '/students?fields=firstname,courses': 4,
+}
+
+
+def count_queries(client, path):
+    # a cached response would run no queries at all
+    response_cache.clear()
+    statements = []
+    stop_recording = record_queries(statements)
+    try:
+        response = client.get(path)
+    finally:
+        stop_recording()
+    assert response.status_code == 200
+    # the session backend's own lookups aren't the endpoint's
+    return len([statement for statement, _ in statements if 'FROM sessions' not in statement])
+
+
+@pytest.mark.parametrize('path', EXPECTED)
+def test_query_count(client, path):
+    assert count_queries(client, path) == EXPECTED[path]
+
+    with app.app_context():
+        add_rows()
+    assert count_queries(client, path) == EXPECTED[path]
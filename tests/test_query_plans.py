@@ -0,0 +1,12 @@
+import pytest
+from query_plans import check_query_plans
+from response_cache import response_cache
+
+
+@pytest.mark.parametrize('login', [None, ('lee.0@lecturer.goldworth.com', 'tpw0'), ('s0.0@student.goldworth.com', 'spw00')])
+def test_no_full_table_scans(login):
+    # cached responses would hide the queries behind them
+    response_cache.clear()
+    email, password = login or (None, None)
+    problems = check_query_plans(email=email, password=password)
+    assert [f'{path}: full scan of {table}' for path, table, _ in problems] == []
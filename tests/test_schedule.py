@@ -0,0 +1,15 @@
+from datetime import date, timedelta
+import schedule
+from app import app
+from schedule import calendar, calendar_cache
+
+
+def test_evicted_windows_are_forgotten(monkeypatch):
+    calendar_cache.clear()
+    monkeypatch.setattr(schedule, '_windows', {})
+    monkeypatch.setattr(calendar_cache, 'maxsize', 3)
+    start = date(2026, 1, 5)
+    with app.app_context():
+        for n in range(20):
+            calendar('student', 1, start + timedelta(days=n), start + timedelta(days=n + 7))
+    assert len(schedule._windows[('student', 1)]) == 3
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+import pytest
+from marshmallow import fields
+from app import app, SCHEMAS
+from config import mash
+from metrics import snapshot
+from models import Course
+from serializers import CompiledSchema, check_serializers, compile_schema, uncompiled
+
+
+def schema_id(schema):
+    return f"{type(schema).__name__}{'-many' if schema.many else ''}"
+
+
+@pytest.mark.parametrize('schema', SCHEMAS, ids=schema_id)
+def test_compiled_dump_matches_marshmallow(schema):
+    # every row of the model, through the schema and each single field only= variant
+    with app.test_request_context():
+        problems = check_serializers([schema])
+    assert [f"{fields}: {compiled} != {expected}" for _, fields, _, compiled, expected in problems] == []
+
+
+@pytest.mark.parametrize('schema', SCHEMAS, ids=schema_id)
+def test_schema_is_compiled(schema):
+    assert compile_schema(schema) is not None
+
+
+class CourseNameSchema(CompiledSchema):
+    class Meta:
+        model = Course
+
+    id = mash.auto_field()
+    course_name = mash.auto_field()
+
+
+def test_object_without_a_field_goes_to_marshmallow():
+    obj = SimpleNamespace(id=1)
+    with app.test_request_context():
+        before = snapshot()['counters'].get('serializers.fallback', 0)
+        with uncompiled():
+            expected = CourseNameSchema().dump(obj)
+        assert CourseNameSchema().dump(obj) == expected == {"id": 1}
+        assert snapshot()['counters']['serializers.fallback'] == before + 1
+
+
+class BrokenSchema(CompiledSchema):
+    class Meta:
+        model = Course
+
+    id = mash.auto_field()
+    title = fields.Method('title_of')
+
+    def title_of(self, obj):
+        return obj.no_such_attribute
+
+
+def test_errors_inside_fields_are_not_swallowed():
+    with app.test_request_context(), pytest.raises(AttributeError):
+        BrokenSchema().dump(SimpleNamespace(id=1))
@@ -0,0 +1,36 @@
+import json
+import pickle
+from flask import Flask
+from flask_session import Session
+from app import app
+from config import db
+from sessions import SessionSerializer, configure_session_backend, configure_session_serializer
+
+
+def test_sessions_are_stored_as_json(client):
+    client.post('/login', json={"email": 's0.0@student.goldworth.com', "password": 'spw00'})
+    sid = client.get_cookie(app.config['SESSION_COOKIE_NAME']).value
+
+    with app.app_context():
+        model = app.session_interface.sql_session_model
+        stored = db.session.scalars(db.select(model.data).where(model.session_id == app.session_interface.key_prefix + sid)).one()
+    assert json.loads(stored)['user'] == 's0.0@student.goldworth.com'
+
+
+def test_pickled_sessions_are_still_read():
+    data = {"user": 's0.0@student.goldworth.com', "_permanent": True}
+    serializer = SessionSerializer()
+    assert serializer.loads(pickle.dumps(data)) == data
+    with app.app_context():
+        assert serializer.loads(serializer.dumps(data)) == data
+
+
+def test_filesystem_sessions_are_not_pruned_by_count(tmp_path):
+    filesystem = Flask(__name__)
+    filesystem.config.update(SESSION_TYPE='filesystem', SESSION_FILE_DIR=str(tmp_path))
+    configure_session_backend(filesystem, None)
+    Session(filesystem)
+    configure_session_serializer(filesystem)
+    cache = filesystem.session_interface.cache
+    assert cache._threshold == 0
+    assert isinstance(cache.serializer, SessionSerializer)
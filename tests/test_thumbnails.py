@@ -0,0 +1,37 @@
+import os
+from PIL import Image
+from werkzeug.datastructures import MIMEAccept
+import thumbnails
+from app import app
+from thumbnails import send_thumbnail
+
+
+def test_unreadable_image_is_sent_as_uploaded(tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'THUMBNAIL_CACHE_PATH', str(tmp_path / 'thumbnails'))
+    (tmp_path / 'broken.png').write_bytes(b'not an image')
+
+    with app.test_request_context():
+        response = send_thumbnail('broken.png', str(tmp_path), 80, MIMEAccept([('image/jpeg', 1)]))
+        response.direct_passthrough = False
+        assert response.status_code == 200
+        assert response.get_data() == b'not an image'
+    assert os.listdir(tmp_path / 'thumbnails') == []
+
+
+def test_cache_is_only_scanned_when_over_budget(tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'THUMBNAIL_CACHE_PATH', str(tmp_path / 'thumbnails'))
+    monkeypatch.setattr(thumbnails, '_cache_bytes', None)
+    Image.new('RGB', (300, 300), 'red').save(tmp_path / 'photo.png')
+    scans = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, 'scandir', lambda path: scans.append(path) or scandir(path))
+
+    with app.test_request_context():
+        for size in (40, 80, 200):
+            thumbnails.thumbnail('photo.png', str(tmp_path), size, 'jpeg')
+        assert len(scans) == 1
+
+        monkeypatch.setitem(app.config, 'THUMBNAIL_CACHE_MAX_BYTES', 1)
+        thumbnails.thumbnail('photo.png', str(tmp_path), 100, 'jpeg')
+        assert len(scans) == 2
+    assert len(os.listdir(tmp_path / 'thumbnails')) == 0
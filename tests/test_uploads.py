@@ -0,0 +1,39 @@
+import hashlib
+import io
+import os
+import pytest
+from app import app
+from storage import ScratchFile, blob_path
+
+
+@pytest.fixture
+def blob_store(tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'BLOB_STORE_PATH', str(tmp_path))
+    return tmp_path
+
+
+def test_multipart_file_is_written_once_and_stored_by_rename(client, blob_store, monkeypatch):
+    data = os.urandom(300 * 1024)
+    copies = []
+    monkeypatch.setattr('storage.copy_hashing', lambda *args: copies.append(args))
+
+    response = client.post('/assignments', content_type='multipart/form-data', data={
+        'assignment_name': 'Essay', 'topic': 'Loops', 'content': 'Attached', 'due_date': '2026-11-01',
+        'course_id': '1', 'teacher_id': '1', 'assignment_file': (io.BytesIO(data), 'essay.pdf'),
+    })
+    assert response.status_code == 201
+
+    sha256 = hashlib.sha256(data).hexdigest()
+    assert response.get_json()['assignment_file'] == sha256
+    with open(blob_path(sha256), 'rb') as stored:
+        assert stored.read() == data
+    assert copies == []
+    assert os.listdir(blob_store / 'tmp') == []
+
+
+def test_file_that_is_not_stored_is_removed(blob_store):
+    with app.test_request_context():
+        spool = ScratchFile()
+        spool.write(b'never stored')
+        spool.close()
+    assert os.listdir(blob_store / 'tmp') == []
@@ -0,0 +1,128 @@
+import hashlib
+import os
+import tempfile
+import threading
+from config import app
+from storage import is_blob, stored_path, send_path, send_stored
+
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError, features
+except ImportError:
+    Image = None
+
+
+_evict_lock = threading.Lock()
+# bytes in the cache directory as of the last scan plus what was rendered since,
+# so the directory is only scanned again once it may be over budget
+_cache_bytes = None
+
+
+def cache_root():
+    root = app.config['THUMBNAIL_CACHE_PATH']
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+def snap_size(size):
+    # only the configured sizes are generated, so the cache stays small
+    sizes = sorted(app.config['THUMBNAIL_SIZES'])
+    return next((s for s in sizes if s >= size), sizes[-1])
+
+
+def pick_format(accept):
+    if accept.best_match(['image/webp', 'image/jpeg']) == 'image/webp' and features.check('webp'):
+        return 'webp'
+    return 'jpeg'
+
+
+def source_key(name, path):
+    if is_blob(name):
+        return name
+    stat = os.stat(path)
+    return hashlib.sha256(f'{path}:{stat.st_mtime_ns}:{stat.st_size}'.encode()).hexdigest()
+
+
+def render(source, target, size, format):
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        if image.mode not in ('RGB', 'RGBA') or format == 'jpeg':
+            image = image.convert('RGB')
+
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(target), delete=False) as tmp:
+            try:
+                image.save(tmp, format=format.upper(), quality=app.config['THUMBNAIL_QUALITY'])
+            except BaseException:
+                os.remove(tmp.name)
+                raise
+        os.chmod(tmp.name, 0o644)
+    os.replace(tmp.name, target)
+
+
+def evict(added):
+    """Count `added` bytes into the cache and, once it may be over
+    THUMBNAIL_CACHE_MAX_BYTES, drop least recently used thumbnails until it fits."""
+    global _cache_bytes
+    with _evict_lock:
+        if _cache_bytes is not None:
+            _cache_bytes += added
+            if _cache_bytes <= app.config['THUMBNAIL_CACHE_MAX_BYTES']:
+                return
+
+        entries = []
+        for entry in os.scandir(cache_root()):
+            if entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_atime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= app.config['THUMBNAIL_CACHE_MAX_BYTES']:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        _cache_bytes = total
+
+
+def thumbnail(name, legacy_dir, size, format):
+    """Path of the cached `size` px thumbnail, rendering it if needed, or
+    None when the stored file can't be read as an image."""
+    source = stored_path(name, legacy_dir)
+    target = os.path.join(cache_root(), f'{source_key(name, source)}-{size}.{format}')
+
+    if os.path.exists(target):
+        os.utime(target)
+    else:
+        try:
+            render(source, target, size, format)
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+            return None
+        evict(os.path.getsize(target))
+    return target
+
+
+def generate_thumbnails(name, legacy_dir):
+    if Image is None:
+        return
+    formats = ['jpeg', 'webp'] if features.check('webp') else ['jpeg']
+    for size in app.config['THUMBNAIL_SIZES']:
+        for format in formats:
+            if thumbnail(name, legacy_dir, size, format) is None:
+                return
+
+
+def send_thumbnail(name, legacy_dir, size, accept):
+    if Image is None:
+        return send_stored(name, legacy_dir)
+
+    format = pick_format(accept)
+    path = thumbnail(name, legacy_dir, snap_size(size), format)
+    if path is None:
+        # not an image Pillow can read, so the file is sent as it was uploaded
+        return send_stored(name, legacy_dir)
+    response = send_path(path, mimetype=f'image/{format}')
+    response.vary.add('Accept')
+    return response